@@ -1,10 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, Response, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, Response, jsonify, send_file, send_from_directory, stream_with_context, has_request_context
+import click
+import atexit
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from functools import wraps
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import io # Necessário para gerar o PDF na memória
+import re
+import base64
+import hashlib
+import hmac
+import math
+import random
+import smtplib
+import sqlite3
+from email.message import EmailMessage
+import time
+import threading
+import unicodedata
+import zipfile
+from collections import deque, namedtuple
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
 
 # Importação para geração de PDF (WeasyPrint)
 try:
@@ -21,6 +40,7 @@ except Exception as e:
 
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
+from google.api_core.exceptions import AlreadyExists
 
 
 # =========================================================
@@ -28,9 +48,65 @@ from firebase_admin import credentials, firestore, auth
 # =========================================================
 app = Flask(__name__)
 
+# Atrás de um proxy reverso (ex.: Render), TRUST_PROXY=1 faz o request.remote_addr usar o X-Forwarded-For
+if os.environ.get('TRUST_PROXY') == '1':
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
 # Configurações de segurança
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'sua_chave_secreta_padrao_muito_longa')
 
+# Catálogo de cursos (definições versionadas em JSON)
+CATALOGO_DIR = os.environ.get('CATALOGO_DIR', os.path.join(app.root_path, 'cursos'))
+CURSO_PADRAO = os.environ.get('CURSO_PADRAO', 'pensamento-computacional')
+CATALOGO_RELOAD_INTERVAL = float(os.environ.get('CATALOGO_RELOAD_INTERVAL', 5))
+
+# E-mails (separados por vírgula) com acesso às rotas de coordenação
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+# Geração de certificados em lote (tamanho da página do Firestore e nº de processos)
+CERTIFICADO_PAGE_SIZE = int(os.environ.get('CERTIFICADO_PAGE_SIZE', 200))
+CERTIFICADO_WORKERS = int(os.environ.get('CERTIFICADO_WORKERS', os.cpu_count() or 2))
+CARGA_HORARIA_CERTIFICADO = 24
+
+# Códigos de verificação dos certificados (HMAC) e cache das respostas de verificação
+CERTIFICADO_SECRET = os.environ.get('CERTIFICADO_SECRET', app.config['SECRET_KEY']).encode('utf-8')
+CERTIFICADO_CACHE_MAX_AGE = 30 * 24 * 3600
+SITE_URL = os.environ.get('SITE_URL', '').rstrip('/')
+
+# Índice de busca dos projetos finais (persistido na pasta 'instance')
+BUSCA_INDEX_PATH = os.environ.get('BUSCA_INDEX_PATH', os.path.join(app.instance_path, 'busca_projetos.json'))
+BUSCA_SAVE_INTERVAL = int(os.environ.get('BUSCA_SAVE_INTERVAL', 30))  # segundos entre gravações em disco
+
+# Chaves de idempotência dos salvamentos (fila offline); 'expira_em' alimenta a política de TTL do Firestore
+IDEMPOTENCIA_TTL = timedelta(days=int(os.environ.get('IDEMPOTENCIA_TTL_DIAS', 7)))
+IDEMPOTENCIA_KEY_RE = re.compile(r'[\w\-]{8,128}')
+
+# Fila de e-mails de saída (SQLite) e servidor SMTP.
+# Para testes locais: python -m aiosmtpd -n -l localhost:1025 e SMTP_HOST=localhost SMTP_PORT=1025
+EMAIL_QUEUE_PATH = os.environ.get('EMAIL_QUEUE_PATH', os.path.join(app.instance_path, 'fila_emails.db'))
+SMTP_HOST = os.environ.get('SMTP_HOST')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USER = os.environ.get('SMTP_USER')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', '1') == '1'
+MAIL_FROM = os.environ.get('MAIL_FROM', 'PC Teacher <nao-responda@pcteacher.com.br>')
+EMAIL_LOTE = int(os.environ.get('EMAIL_LOTE', 50))             # mensagens por conexão SMTP
+EMAIL_MAX_TENTATIVAS = int(os.environ.get('EMAIL_MAX_TENTATIVAS', 6))
+EMAIL_BACKOFF_BASE = int(os.environ.get('EMAIL_BACKOFF_BASE', 30))  # segundos (dobra a cada tentativa)
+EMAIL_LEASE = 300                                               # segundos até um lote "enviando" ser retomado
+EMAIL_HISTORICO = 24 * 3600                                     # segundos que os enviados ficam registrados
+# Proteção da recuperação de senha: um pedido por e-mail por janela e limite de pedidos por IP
+RECUPERACAO_JANELA = int(os.environ.get('RECUPERACAO_JANELA_MIN', 15)) * 60
+RECUPERACAO_LIMITE_IP = int(os.environ.get('RECUPERACAO_LIMITE_IP', 5))  # pedidos por hora
+
+# Registro de atividades de aprendizagem: 'ndjson' (segmentos locais) ou 'firestore' (coleção 'atividades')
+ATIVIDADES_DESTINO = os.environ.get('ATIVIDADES_DESTINO', 'ndjson')
+ATIVIDADES_DIR = os.environ.get('ATIVIDADES_DIR', os.path.join(app.instance_path, 'atividades'))
+ATIVIDADES_CAPACIDADE = int(os.environ.get('ATIVIDADES_CAPACIDADE', 10000))  # eventos no buffer em memória
+ATIVIDADES_LOTE = int(os.environ.get('ATIVIDADES_LOTE', 500))                # descarrega ao atingir este tamanho...
+ATIVIDADES_INTERVALO = float(os.environ.get('ATIVIDADES_INTERVALO', 5))      # ...ou a cada N segundos
+ATIVIDADES_SEGMENTO_BYTES = int(os.environ.get('ATIVIDADES_SEGMENTO_BYTES', 16 * 1024 * 1024))
+
 
 # =========================================================
 # 1.1 CONFIGURAÇÃO FIREBASE ADMIN SDK
@@ -69,65 +145,131 @@ elif not firebase_admin._apps:
 # 3. HELPERS E DECORATORS
 # =========================================================
 
-# --- CONFIGURAÇÃO ESTÁTICA DOS MÓDULOS ---
-MODULO_CONFIG = [
-    {
-        'title': 'Introdução ao Pensamento Computacional',
-        'field': 'introducao_concluido',
-        'slug': 'introducao',
-        'template': 'conteudo-introducao.html',  
-        'order': 1,
-        'description': 'Entenda o que é o Pensamento Computacional, seus pilares e por que ele é crucial para o futuro.',
-        'lessons': 1, 'exercises': 5, 'dependency_field': None
-    },
-    {
-        'title': 'Decomposição',
-        'field': 'decomposicao_concluido',
-        'slug': 'decomposicao',
-        'template': 'conteudo-decomposicao.html',  
-        'order': 2,
-        'description': 'Aprenda a quebrar problemas complexos em partes menores e gerenciáveis.',
-        'lessons': 1, 'exercises': 5, 'dependency_field': 'introducao_concluido'
-    },
-    {
-        'title': 'Reconhecimento de Padrões',
-        'field': 'reconhecimento_padroes_concluido',
-        'slug': 'rec-padrao',
-        'template': 'conteudo-rec-padrao.html',  
-        'order': 3,
-        'description': 'Identifique similaridades e tendências para simplificar a resolução de problemas.',
-        'lessons': 1, 'exercises': 5, 'dependency_field': 'decomposicao_concluido'
-    },
-    {
-        'title': 'Abstração',
-        'field': 'abstracao_concluido',
-        'slug': 'abstracao',
-        'template': 'conteudo-abstracao.html',  
-        'order': 4,
-        'description': 'Foque apenas nas informações importantes, ignorando detalhes irrelevantes.',
-        'lessons': 1, 'exercises': 5, 'dependency_field': 'reconhecimento_padroes_concluido'
-    },
-    {
-        'title': 'Algoritmos',
-        'field': 'algoritmo_concluido',
-        'slug': 'algoritmo',
-        'template': 'conteudo-algoritmo.html',  
-        'order': 5,
-        'description': 'Desenvolva sequências lógicas e organizadas para resolver problemas de forma eficaz.',
-        'lessons': 1, 'exercises': 5, 'dependency_field': 'abstracao_concluido'
-    },
-    {
-        'title': 'Projeto Final',
-        'field': 'projeto_final_concluido',
-        'slug': 'projeto-final',
-        'template': 'conteudo-projeto-final.html',  
-        'order': 6,
-        'description': 'Aplique todos os pilares do PC para solucionar um desafio prático de sala de aula.',
-        'lessons': 1, 'exercises': 0, 'dependency_field': 'algoritmo_concluido'
-    },
-]
+# --- CATÁLOGO DE CURSOS (arquivos JSON em 'cursos/') ---
+# Cada arquivo define um curso versionado e sua lista de módulos. Os arquivos são compilados
+# em um índice imutável (por slug, campo de progresso e ordem) e trocado de forma atômica
+# quando algum arquivo muda, sem reiniciar o servidor.
+
+Curso = namedtuple('Curso', [
+    'slug', 'versao', 'titulo', 'modulos', 'por_slug', 'por_campo', 'por_ordem', 'proximo',
+    'progresso_inicial', 'total_lessons', 'total_exercises',
+])
+
+MODULO_CAMPOS_OBRIGATORIOS = ('title', 'field', 'slug', 'template', 'order', 'description', 'lessons', 'exercises')
+
+
+def compilar_curso(definicao, origem=''):
+    """Valida a definição de um curso e gera o índice imutável correspondente."""
+    for chave in ('slug', 'versao', 'titulo', 'modulos'):
+        if chave not in definicao:
+            raise ValueError(f"{origem}: chave obrigatória '{chave}' ausente.")
+
+    for modulo in definicao['modulos']:
+        faltando = [c for c in MODULO_CAMPOS_OBRIGATORIOS if c not in modulo]
+        if faltando:
+            raise ValueError(f"{origem}: módulo '{modulo.get('slug')}' sem {', '.join(faltando)}.")
+        if isinstance(modulo['order'], bool) or not isinstance(modulo['order'], int):
+            raise ValueError(f"{origem}: 'order' do módulo '{modulo['slug']}' deve ser um número inteiro.")
+
+    modulos = []
+    for modulo in sorted(definicao['modulos'], key=lambda m: m['order']):
+        modulos.append(MappingProxyType(dict(modulo, dependency_field=modulo.get('dependency_field'))))
+    modulos = tuple(modulos)
+
+    por_slug = {m['slug']: m for m in modulos}
+    por_campo = {m['field']: m for m in modulos}
+    por_ordem = {m['order']: m for m in modulos}
+    if not (len(por_slug) == len(por_campo) == len(por_ordem) == len(modulos)):
+        raise ValueError(f"{origem}: slugs, campos e ordens dos módulos devem ser únicos.")
+    for m in modulos:
+        if m['dependency_field'] and m['dependency_field'] not in por_campo:
+            raise ValueError(f"{origem}: dependência '{m['dependency_field']}' do módulo '{m['slug']}' não existe.")
+
+    return Curso(
+        slug=definicao['slug'],
+        versao=definicao['versao'],
+        titulo=definicao['titulo'],
+        modulos=modulos,
+        por_slug=MappingProxyType(por_slug),
+        por_campo=MappingProxyType(por_campo),
+        por_ordem=MappingProxyType(por_ordem),
+        # Próximo módulo pela posição na sequência (as ordens não precisam ser consecutivas)
+        proximo=MappingProxyType({m['slug']: p for m, p in zip(modulos, modulos[1:] + (None,))}),
+        progresso_inicial=MappingProxyType({m['field']: False for m in modulos}),
+        total_lessons=sum(m['lessons'] for m in modulos),
+        total_exercises=sum(m['exercises'] for m in modulos),
+    )
+
+
+class CatalogoCursos:
+    """
+    Índice dos cursos carregados de CATALOGO_DIR. As leituras usam apenas a referência atual
+    (sem trabalho por requisição); uma thread verifica os arquivos a cada
+    CATALOGO_RELOAD_INTERVAL segundos e troca o índice inteiro quando algo muda.
+    """
 
-MODULO_BY_SLUG = {m['slug']: m for m in MODULO_CONFIG}
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._cursos = MappingProxyType({})
+        self._assinatura = None
+        self._monitor = None
+        self.recarregar()
+
+    def _assinatura_arquivos(self):
+        arquivos = sorted(f for f in os.listdir(self.diretorio) if f.endswith('.json'))
+        return tuple((f, os.stat(os.path.join(self.diretorio, f)).st_mtime_ns) for f in arquivos)
+
+    def recarregar(self):
+        """Compila todos os arquivos e substitui o índice. Em caso de erro, o índice atual é mantido."""
+        assinatura = self._assinatura_arquivos()
+        cursos = {}
+        campos_em_uso = {}  # campo de progresso -> slug do curso
+        for nome_arquivo, _ in assinatura:
+            with open(os.path.join(self.diretorio, nome_arquivo), encoding='utf-8') as f:
+                curso = compilar_curso(json.load(f), origem=nome_arquivo)
+            if curso.slug in cursos:
+                raise ValueError(f"{nome_arquivo}: curso '{curso.slug}' duplicado.")
+            # Todos os cursos gravam no mesmo documento 'progresso' do usuário
+            for campo in curso.por_campo:
+                if campo in campos_em_uso:
+                    raise ValueError(
+                        f"{nome_arquivo}: campo de progresso '{campo}' já usado pelo curso '{campos_em_uso[campo]}'."
+                    )
+                campos_em_uso[campo] = curso.slug
+            cursos[curso.slug] = curso
+        if CURSO_PADRAO not in cursos:
+            raise ValueError(f"Curso padrão '{CURSO_PADRAO}' não encontrado em '{self.diretorio}'.")
+
+        self._cursos = MappingProxyType(cursos)
+        self._assinatura = assinatura
+        versoes = ', '.join(f'{c.slug} v{c.versao}' for c in cursos.values())
+        print(f"INFO: Catálogo de cursos carregado ({versoes}).")
+
+    def _loop_monitor(self):
+        assinatura_rejeitada = None
+        while True:
+            time.sleep(CATALOGO_RELOAD_INTERVAL)
+            assinatura = None
+            try:
+                assinatura = self._assinatura_arquivos()
+                if assinatura not in (self._assinatura, assinatura_rejeitada):
+                    self.recarregar()
+            except Exception as e:
+                assinatura_rejeitada = assinatura
+                print(f"AVISO: Catálogo de cursos não recarregado, mantendo a versão atual: {e}")
+
+    def curso(self, slug=None):
+        """Retorna o curso compilado (o curso padrão quando slug é None)."""
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._loop_monitor, name='catalogo-cursos', daemon=True)
+            self._monitor.start()
+        return self._cursos[slug or CURSO_PADRAO]
+
+    def cursos(self):
+        return tuple(self._cursos.values())
+
+
+catalogo_cursos = CatalogoCursos(CATALOGO_DIR)
 
 
 def get_firestore_doc(collection_name, doc_id):
@@ -160,25 +302,100 @@ def get_projeto_usuario(user_id):
     }
 
     if projeto_data:
-        # Apenas mescla os dados existentes com os defaults para garantir a presença de todas as chaves
-        # Nota: Se o Firestore estiver usando chaves antigas ('otimizacao_padrao', 'publico-alvo', etc.),
-        # você deve mapeá-las aqui. A lógica de compatibilidade abaixo foi ajustada para os novos nomes:
-        
-        # Mapeamento de chaves antigas para novas (se necessário, baseado em como você as nomeou antes):
-        # Ex: Se antes usava 'otimizacao_padrao' e agora quer 'rec_padrao':
-        if 'otimizacao_padrao' in projeto_data: 
-             projeto_data['rec_padrao'] = projeto_data.pop('otimizacao_padrao')
-        # Ex: Se antes usava 'publico-alvo' e agora quer 'publico_alvo':
-        if 'publico-alvo' in projeto_data: 
-             projeto_data['publico_alvo'] = projeto_data.pop('publico-alvo')
-        # ... Adicione outros mapeamentos conforme necessário ...
-
+        # Apenas mescla os dados existentes com os defaults para garantir a presença de todas as chaves.
+        # Documentos com chaves antigas são convertidos uma única vez pelo comando 'flask migrar-projetos';
+        # até lá, as chaves antigas ainda preenchem os campos novos vazios.
         default_data.update(projeto_data)
-        return default_data
+        for antiga, nova in PROJETOS_CHAVES_LEGADAS.items():
+            if not default_data.get(nova) and projeto_data.get(antiga):
+                default_data[nova] = projeto_data[antiga]
         
     return default_data
 
 
+# --- MIGRAÇÕES DE ESQUEMA DA COLEÇÃO 'projetos' ---
+# Cada migração recebe o dict do documento e retorna o dict de alterações para o update().
+# Use firestore.DELETE_FIELD para remover chaves; nomes com hífen devem vir entre crases.
+
+PROJETOS_CHAVES_LEGADAS = {
+    'otimizacao_padrao': 'rec_padrao',
+    'publico-alvo': 'publico_alvo',
+}
+
+def _migracao_projetos_v1(projeto_data):
+    """
+    Renomeia as chaves antigas 'otimizacao_padrao' e 'publico-alvo'.
+    O valor antigo só é copiado se a chave nova estiver vazia: o que o professor
+    já salvou com o esquema novo não é sobrescrito pelo texto antigo.
+    """
+    alteracoes = {}
+    for antiga, nova in PROJETOS_CHAVES_LEGADAS.items():
+        if antiga in projeto_data:
+            if not projeto_data.get(nova):
+                alteracoes[nova] = projeto_data[antiga]
+            alteracoes[f'`{antiga}`' if '-' in antiga else antiga] = firestore.DELETE_FIELD
+    return alteracoes
+
+MIGRACOES_PROJETOS = [
+    (1, _migracao_projetos_v1),
+]
+
+PROJETOS_SCHEMA_VERSION = MIGRACOES_PROJETOS[-1][0]
+FIRESTORE_MAX_BATCH = 500
+
+
+def migrar_projetos(dry_run=False, desde=None, page_size=FIRESTORE_MAX_BATCH):
+    """
+    Percorre 'projetos' por cursor (ID do documento) e aplica as migrações pendentes,
+    gravando em lotes de até 500 escritas e carimbando 'schema_version'.
+    'desde' permite retomar a partir de um ID já processado.
+    Retorna (examinados, migrados, ultimo_id).
+    """
+    page_size = min(page_size, FIRESTORE_MAX_BATCH)  # uma escrita por documento da página
+    colecao = db.collection('projetos')
+    query = colecao.order_by('__name__').limit(page_size)
+    # Cursor pelo ID (sem leitura): funciona mesmo que o documento 'desde' já tenha sido removido
+    cursor = {'__name__': colecao.document(desde)} if desde else None
+    examinados = migrados = 0
+    ultimo_id = desde
+
+    while True:
+        pagina = query.start_after(cursor) if cursor else query
+        docs = list(pagina.stream())
+        if not docs:
+            break
+
+        batch = db.batch()
+        escritas = 0
+        for doc in docs:
+            examinados += 1
+            projeto_data = doc.to_dict()
+            versao_atual = projeto_data.get('schema_version', 0)
+            if versao_atual >= PROJETOS_SCHEMA_VERSION:
+                continue
+
+            alteracoes = {}
+            for versao, migracao in MIGRACOES_PROJETOS:
+                if versao > versao_atual:
+                    alteracoes.update(migracao(projeto_data))
+            alteracoes['schema_version'] = PROJETOS_SCHEMA_VERSION
+
+            batch.update(doc.reference, alteracoes)
+            escritas += 1
+
+        if escritas and not dry_run:
+            batch.commit()
+        migrados += escritas
+        cursor = docs[-1]
+        ultimo_id = cursor.id
+        print(f"INFO: {examinados} projetos examinados, {migrados} migrados (último ID: {ultimo_id}).")
+
+        if len(docs) < page_size:
+            break
+
+    return examinados, migrados, ultimo_id
+
+
 def usuario_logado():
     """Retorna o objeto (dict) Usuario logado ou None, buscando no Firestore."""
     if 'usuario_id' in session:
@@ -206,21 +423,48 @@ def requires_auth(func):
         return func(*args, **kwargs)
     return wrapper
 
+def requires_session(func):
+    """
+    Decorator leve: exige apenas o usuario_id na sessão, sem carregar o usuário do Firestore.
+    Para rotas que fazem suas próprias leituras (ou nenhuma).
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if 'usuario_id' not in session:
+            flash('Você precisa estar logado para acessar esta página.', 'warning')
+            return redirect(url_for('login'))
+        return func(*args, **kwargs)
+    return wrapper
+
+def requires_admin(func):
+    """Decorator para restringir a rota aos coordenadores listados em ADMIN_EMAILS."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        usuario = usuario_logado()
+        if not usuario:
+            flash('Você precisa estar logado para acessar esta página.', 'warning')
+            return redirect(url_for('login'))
+        if usuario.get('email', '').lower() not in ADMIN_EMAILS:
+            flash('Acesso restrito à coordenação.', 'danger')
+            return redirect(url_for('dashboard'))
+        return func(*args, **kwargs)
+    return wrapper
+
 # ... (A função calculate_progress permanece a mesma) ...
-def calculate_progress(progresso_db):
+def calculate_progress(progresso_db, curso=None):
     """Calcula todas as métricas de progresso do curso."""
-    # (A lógica de cálculo de progresso permanece a mesma)
+    curso = curso or catalogo_cursos.curso()
     
-    total_modules = len(MODULO_CONFIG)
+    total_modules = len(curso.modulos)
     completed_modules = 0
-    total_lessons = sum(m['lessons'] for m in MODULO_CONFIG)
-    total_exercises = sum(m['exercises'] for m in MODULO_CONFIG)
+    total_lessons = curso.total_lessons
+    total_exercises = curso.total_exercises
     completed_lessons = 0
     completed_exercises = 0
     
     dynamic_modules = []
     
-    for module_config in MODULO_CONFIG:
+    for module_config in curso.modulos:
         db_field = module_config['field']
         
         is_completed = progresso_db.get(db_field, False) 
@@ -263,9 +507,27 @@ def calculate_progress(progresso_db):
     }
 # ... (Fim da função calculate_progress) ...
 
+MESES_PT = (
+    'janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+    'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro',
+)
+
+def data_por_extenso(data):
+    """Formata a data em português (ex.: '19 de outubro de 2026'), independente do locale do servidor."""
+    return f'{data.day} de {MESES_PT[data.month - 1]} de {data.year}'
+
+LATEX_ESPECIAIS = {
+    '\\': r'\textbackslash{}', '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_',
+    '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}', '^': r'\textasciicircum{}',
+}
+
+def escapar_latex(texto):
+    """Escapa os caracteres especiais do LaTeX em textos informados pelo usuário (ex.: o nome)."""
+    return ''.join(LATEX_ESPECIAIS.get(c, c) for c in str(texto))
+
 # Lógica para gerar o certificado (permanece a mesma)
-def generate_latex_certificate(nome_completo, data_conclusao_str, carga_horaria):
-    """Gera o conteúdo LaTeX para o certificado."""
+def generate_latex_certificate(nome_completo, data_conclusao_str, carga_horaria, codigo='', url_verificacao='', titulo_curso=''):
+    """Gera o conteúdo LaTeX para o certificado (os textos são escapados aqui)."""
     # (Template LaTeX omitido para brevidade, mas permanece inalterado)
     latex_template = r"""
 \documentclass[10pt, a4paper]{article}
@@ -305,7 +567,7 @@ def generate_latex_certificate(nome_completo, data_conclusao_str, carga_horaria)
 {\Large Concluiu o curso online:}
 
 \vspace{0.8cm}
-{\huge\bfseries Pensamento Computacional para Professores}
+{\huge\bfseries %s}
 
 \vspace{0.8cm}
 {\Large com carga horária total de \textbf{%d horas}.}
@@ -330,14 +592,841 @@ def generate_latex_certificate(nome_completo, data_conclusao_str, carga_horaria)
 \end{minipage}
 \end{tabular}
 
+\vspace{0.8cm}
+{\small Código de verificação: \texttt{%s} \quad %s}
+
 \end{minipage}
 }}
 \end{center}
 \end{document}
-""" % (nome_completo, carga_horaria, data_conclusao_str)
+""" % tuple(escapar_latex(v) if isinstance(v, str) else v
+           for v in (nome_completo, titulo_curso, carga_horaria, data_conclusao_str, codigo, url_verificacao))
     
     return latex_template
 
+
+# --- CÓDIGO DE VERIFICAÇÃO DO CERTIFICADO ---
+
+CERTIFICADO_CODIGO_RE = re.compile(r'[A-Z2-7]{10}-[A-Z2-7]{10}')
+
+def _b32(data, tamanho=10):
+    return base64.b32encode(data).decode('ascii')[:tamanho]
+
+def _assinar_certificado(certificado_id):
+    return _b32(hmac.new(CERTIFICADO_SECRET, certificado_id.encode('ascii'), hashlib.sha256).digest())
+
+def codigo_certificado(user_id):
+    """
+    Código curto 'ID-ASSINATURA' do certificado do usuário. O ID é derivado do user_id
+    (sem leitura no banco) e a assinatura é um HMAC com CERTIFICADO_SECRET.
+    """
+    certificado_id = _b32(hashlib.sha256(f'certificado:{user_id}'.encode('utf-8')).digest())
+    return f'{certificado_id}-{_assinar_certificado(certificado_id)}'
+
+def validar_codigo_certificado(codigo):
+    """Retorna o ID do certificado se a assinatura do código confere; caso contrário, None."""
+    codigo = (codigo or '').strip().upper()
+    # Formato conferido antes do HMAC: entradas fora do alfabeto base32 nunca chegam ao encode/compare_digest
+    if not CERTIFICADO_CODIGO_RE.fullmatch(codigo):
+        return None
+    certificado_id, _, assinatura = codigo.partition('-')
+    if not hmac.compare_digest(assinatura, _assinar_certificado(certificado_id)):
+        return None
+    return certificado_id
+
+def url_base_verificacao():
+    """Raiz do site para os links de verificação: SITE_URL ou o host da requisição atual."""
+    if SITE_URL:
+        return SITE_URL
+    return request.host_url.rstrip('/') if has_request_context() else ''
+
+def url_verificacao_certificado(codigo, url_base=None):
+    """URL pública de verificação do certificado."""
+    if url_base is None:
+        url_base = url_base_verificacao()
+    return f'{url_base}/certificados/verificar/{codigo}'
+
+def registrar_certificados(concluintes, data_emissao):
+    """
+    Grava o índice compacto 'certificados' (um documento por código) em lotes de até 500 escritas.
+    Certificados já registrados não são alterados: a data de emissão fica fixa na primeira emissão.
+    """
+    concluintes = list(concluintes)
+    titulo_curso = catalogo_cursos.curso().titulo
+    for inicio in range(0, len(concluintes), FIRESTORE_MAX_BATCH):
+        novos = {}
+        for user_id, nome in concluintes[inicio:inicio + FIRESTORE_MAX_BATCH]:
+            certificado_id = codigo_certificado(user_id).split('-')[0]
+            novos[certificado_id] = (db.collection('certificados').document(certificado_id), {
+                'nome': nome,
+                'curso': titulo_curso,
+                'carga_horaria': CARGA_HORARIA_CERTIFICADO,
+                'data_emissao': data_emissao,
+            })
+
+        if len(novos) == 1:
+            # Emissão individual: um único create(), sem leitura prévia
+            ref, certificado_data = next(iter(novos.values()))
+            try:
+                ref.create(certificado_data)
+            except AlreadyExists:
+                pass
+            continue
+
+        # Em lote: descarta os já existentes para que o create() do batch não falhe por inteiro
+        refs = [ref for ref, _ in novos.values()]
+        for snapshot in db.get_all(refs, field_paths=['data_emissao']):
+            if snapshot.exists:
+                novos.pop(snapshot.id, None)
+        if not novos:
+            continue
+
+        batch = db.batch()
+        for ref, certificado_data in novos.values():
+            batch.create(ref, certificado_data)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            # Outro processo registrou algum deles entre a leitura e a escrita: cria um a um
+            for ref, certificado_data in novos.values():
+                try:
+                    ref.create(certificado_data)
+                except AlreadyExists:
+                    pass
+
+
+# --- CERTIFICADOS EM LOTE (TURMA COMPLETA) ---
+
+def listar_concluintes(page_size=CERTIFICADO_PAGE_SIZE):
+    """
+    Percorre a coleção 'progresso' em páginas (cursor por ID do documento) e
+    gera listas de (user_id, nome) dos usuários com 100% de progresso.
+    Cada página é resolvida com um único get_all na coleção 'usuarios'.
+    """
+    ultimo_modulo = catalogo_cursos.curso().modulos[-1]
+    query = (db.collection('progresso')
+             .where(ultimo_modulo['field'], '==', True)
+             .order_by('__name__')
+             .limit(page_size))
+    ultimo_doc = None
+
+    while True:
+        pagina = query.start_after(ultimo_doc) if ultimo_doc else query
+        docs = list(pagina.stream())
+        if not docs:
+            break
+        ultimo_doc = docs[-1]
+
+        concluintes_ids = [d.id for d in docs if calculate_progress(d.to_dict())['overall_percent'] == 100]
+        if concluintes_ids:
+            refs = [db.collection('usuarios').document(uid) for uid in concluintes_ids]
+            usuarios = [u for u in db.get_all(refs) if u.exists]
+            yield [(u.id, u.to_dict().get('nome', '')) for u in usuarios]
+
+        if len(docs) < page_size:
+            break
+
+
+def _renderizar_certificado(item):
+    """Executado nos processos do pool: retorna (nome_do_arquivo, conteúdo .tex em bytes)."""
+    user_id, nome, data_conclusao_str, url_base, titulo_curso = item
+    nome_completo = nome.upper()
+    codigo = codigo_certificado(user_id)
+    latex_content = generate_latex_certificate(
+        nome_completo, data_conclusao_str, CARGA_HORARIA_CERTIFICADO, codigo,
+        url_verificacao_certificado(codigo, url_base), titulo_curso
+    )
+    nome_arquivo = re.sub(r'[^\w\-]+', '_', nome_completo).strip('_') or 'SEM_NOME'
+    return f'Certificado_{nome_arquivo}_{user_id}.tex', latex_content.encode('utf-8')
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Destino não-pesquisável para o ZipFile: acumula os bytes até serem drenados."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def gerar_zip_certificados(paginas, workers=CERTIFICADO_WORKERS, registrar=True, url_base=None):
+    """
+    Renderiza os certificados de cada página em paralelo (ProcessPoolExecutor)
+    e produz o arquivo ZIP em pedaços, sem manter a turma inteira em memória.
+    Com 'registrar', grava cada página no índice 'certificados' usado na verificação.
+    """
+    data_conclusao_str = data_por_extenso(datetime.now())
+    data_emissao = datetime.now().strftime('%d/%m/%Y')
+    if url_base is None:
+        url_base = url_base_verificacao()
+    titulo_curso = catalogo_cursos.curso().titulo
+    buffer = _ZipStreamBuffer()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for pagina in paginas:
+                if registrar:
+                    registrar_certificados(pagina, data_emissao)
+                itens = [(user_id, nome, data_conclusao_str, url_base, titulo_curso) for user_id, nome in pagina]
+                chunksize = max(1, len(itens) // (workers * 4))
+                for nome_arquivo, conteudo in pool.map(_renderizar_certificado, itens, chunksize=chunksize):
+                    zf.writestr(nome_arquivo, conteudo)
+                    yield buffer.drain()
+        # O diretório central do ZIP só é escrito no close()
+        yield buffer.drain()
+
+# =========================================================
+# 3.1 BUSCA DE PROJETOS (ÍNDICE INVERTIDO LOCAL)
+# =========================================================
+
+# Campos indexados e seus pesos na pontuação
+BUSCA_CAMPOS = {
+    'nome_projeto': 3,
+    'objetivo': 2,
+    'decomposicao': 1,
+    'rec_padrao': 1,
+    'abstracao': 1,
+    'algoritmo': 1,
+}
+
+BUSCA_STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'como', 'da', 'das', 'de', 'do', 'dos', 'e', 'ela', 'ele',
+    'em', 'entre', 'era', 'essa', 'esse', 'esta', 'este', 'eu', 'foi', 'ha', 'isso', 'isto',
+    'ja', 'mais', 'mas', 'na', 'nas', 'nao', 'no', 'nos', 'o', 'os', 'ou', 'para', 'pela',
+    'pelas', 'pelo', 'pelos', 'por', 'que', 'se', 'sem', 'ser', 'seu', 'sua', 'suas', 'seus',
+    'so', 'tambem', 'um', 'uma', 'umas', 'uns',
+}
+
+# Sufixos em ordem de prioridade (sem acentos): (sufixo, substituição, tamanho mínimo do radical)
+BUSCA_SUFIXOS_PLURAL = [('oes', 'ao', 3), ('aes', 'ao', 3), ('ais', 'al', 2), ('eis', 'el', 3),
+                        ('is', 'il', 3), ('ns', 'm', 2), ('res', 'r', 3), ('les', 'l', 3), ('s', '', 2)]
+BUSCA_SUFIXOS = [('amente', '', 4), ('mente', '', 4), ('idades', '', 4), ('idade', '', 4),
+                 ('acoes', '', 4), ('acao', '', 4), ('adores', '', 4), ('adora', '', 4), ('ador', '', 4),
+                 ('ismos', '', 4), ('ismo', '', 4), ('istas', '', 4), ('ista', '', 4),
+                 ('avel', '', 4), ('ivel', '', 4), ('encia', '', 4), ('ancia', '', 4),
+                 ('ico', '', 4), ('ica', '', 4), ('oso', '', 4), ('osa', '', 4),
+                 ('ar', '', 4), ('er', '', 4), ('ir', '', 4), ('a', '', 4), ('o', '', 4), ('e', '', 4)]
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _remover_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+
+def _aplicar_sufixos(palavra, sufixos):
+    for sufixo, substituto, minimo in sufixos:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= minimo:
+            return palavra[:-len(sufixo)] + substituto
+    return palavra
+
+
+def normalizar_termos(texto):
+    """Tokeniza o texto em português: minúsculas, sem acentos, sem stopwords e com radicalização leve."""
+    termos = []
+    for palavra in re.findall(r'\w+', _remover_acentos((texto or '').lower())):
+        if palavra in BUSCA_STOPWORDS or len(palavra) < 2:
+            continue
+        radical = _aplicar_sufixos(_aplicar_sufixos(palavra, BUSCA_SUFIXOS_PLURAL), BUSCA_SUFIXOS)
+        termos.append(radical)
+    return termos
+
+
+class IndiceProjetos:
+    """
+    Índice invertido em memória dos projetos finais, com pontuação BM25 ponderada por campo.
+    Atualizado incrementalmente; uma thread grava o JSON a cada BUSCA_SAVE_INTERVAL segundos,
+    fora do lock, para que o salvamento do projeto e as buscas não esperem pela escrita.
+    Se o arquivo for substituído por outro processo (ex.: 'flask indexar-projetos'), o índice
+    é recarregado e as alterações locais ainda não gravadas são reaplicadas.
+    """
+
+    def __init__(self, path, gravacao_automatica=True):
+        self.path = path
+        self.gravacao_automatica = gravacao_automatica
+        self._lock = threading.RLock()
+        self._lock_gravacao = threading.Lock()
+        self._worker = None
+        self._parar = threading.Event()
+        self._postings = {}     # termo -> {projeto_id: frequência ponderada}
+        self._publicos = {}     # termo do público-alvo -> {projeto_id}
+        self._documentos = {}   # projeto_id -> {'termos': {...}, 'tamanho': n, 'nome_projeto': ..., 'publico_alvo': ..., 'publico_termos': [...]}
+        self._tamanho_total = 0
+        self._sujo = False
+        self._pendentes = {}    # projeto_id -> doc (ou None) alterados desde a última gravação
+        self._ultima_verificacao = 0.0
+        self._mtime = None
+        self._carregar()
+
+    def _mtime_arquivo(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _carregar(self):
+        self._postings = {}
+        self._publicos = {}
+        self._documentos = {}
+        self._tamanho_total = 0
+        self._mtime = self._mtime_arquivo()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                documentos = json.load(f)
+        except FileNotFoundError:
+            documentos = {}
+        except Exception as e:
+            print(f"AVISO: Índice de busca '{self.path}' ignorado: {e}")
+            documentos = {}
+        for projeto_id, doc in documentos.items():
+            self._indexar_termos(projeto_id, doc)
+        for projeto_id, doc in self._pendentes.items():
+            self._remover_termos(projeto_id)
+            if doc:
+                self._indexar_termos(projeto_id, doc)
+
+    def _recarregar_se_alterado(self, forcar=False):
+        """Recarrega o índice se o arquivo mudou em disco (verificado no máximo uma vez por segundo)."""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_verificacao < 1:
+            return
+        self._ultima_verificacao = agora
+        mtime = self._mtime_arquivo()
+        if mtime is not None and mtime != self._mtime:
+            self._carregar()
+
+    def _indexar_termos(self, projeto_id, doc):
+        if 'publico_termos' not in doc:  # índices gravados antes deste campo
+            doc['publico_termos'] = sorted(set(normalizar_termos(doc.get('publico_alvo'))))
+        self._documentos[projeto_id] = doc
+        self._tamanho_total += doc['tamanho']
+        for termo, freq in doc['termos'].items():
+            self._postings.setdefault(termo, {})[projeto_id] = freq
+        for termo in doc['publico_termos']:
+            self._publicos.setdefault(termo, set()).add(projeto_id)
+
+    def _remover_termos(self, projeto_id):
+        doc = self._documentos.pop(projeto_id, None)
+        if not doc:
+            return
+        self._tamanho_total -= doc['tamanho']
+        for termo in doc['termos']:
+            postings = self._postings.get(termo)
+            if postings is not None:
+                postings.pop(projeto_id, None)
+                if not postings:
+                    del self._postings[termo]
+        for termo in doc['publico_termos']:
+            projetos = self._publicos.get(termo)
+            if projetos is not None:
+                projetos.discard(projeto_id)
+                if not projetos:
+                    del self._publicos[termo]
+
+    def atualizar(self, projeto_id, projeto_data):
+        """(Re)indexa um projeto a partir do dict completo de campos."""
+        termos = {}
+        for campo, peso in BUSCA_CAMPOS.items():
+            for termo in normalizar_termos(projeto_data.get(campo, '')):
+                termos[termo] = termos.get(termo, 0) + peso
+        doc = {
+            'termos': termos,
+            'tamanho': sum(termos.values()),
+            'nome_projeto': projeto_data.get('nome_projeto', ''),
+            'publico_alvo': projeto_data.get('publico_alvo', ''),
+            'publico_termos': sorted(set(normalizar_termos(projeto_data.get('publico_alvo', '')))),
+        }
+        with self._lock:
+            self._recarregar_se_alterado()
+            self._remover_termos(projeto_id)
+            if termos:
+                self._indexar_termos(projeto_id, doc)
+            self._pendentes[projeto_id] = doc if termos else None
+            self._sujo = True
+        if self.gravacao_automatica and self._worker is None:
+            self._iniciar_worker()
+
+    def _iniciar_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop_worker, name='indice-projetos', daemon=True)
+                self._worker.start()
+
+    def _loop_worker(self):
+        while not self._parar.wait(timeout=BUSCA_SAVE_INTERVAL):
+            try:
+                self.salvar()
+            except Exception as e:
+                print(f"ERRO ao gravar o índice de busca: {e}")
+
+    def parar_worker(self):
+        """Encerra a thread de gravação (a próxima atualização inicia outra)."""
+        worker = self._worker
+        if worker:
+            self._parar.set()
+            worker.join()
+        with self._lock:
+            self._worker = None
+            self._parar = threading.Event()
+
+    def salvar(self):
+        """
+        Grava o índice em disco de forma atômica (arquivo temporário + rename).
+        Sob o lock só é copiado o dicionário de documentos (que nunca são alterados no lugar);
+        a serialização e a escrita acontecem fora dele.
+        """
+        with self._lock_gravacao:
+            with self._lock:
+                if not self._sujo:
+                    return
+                # Não sobrescreve um índice reconstruído por outro processo
+                self._recarregar_se_alterado(forcar=True)
+                documentos = dict(self._documentos)
+                pendentes, self._pendentes = self._pendentes, {}
+                self._sujo = False
+
+            tmp_path = f'{self.path}.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    # Um documento por vez: um único json.dumps do índice inteiro seguraria o GIL
+                    # (e, com ele, as buscas das outras threads) durante toda a serialização
+                    f.write('{')
+                    for i, (projeto_id, doc) in enumerate(documentos.items()):
+                        f.write(f"{',' if i else ''}{json.dumps(projeto_id)}:{json.dumps(doc, ensure_ascii=False)}")
+                    f.write('}')
+                with self._lock:
+                    os.replace(tmp_path, self.path)
+                    self._mtime = self._mtime_arquivo()
+            except Exception:
+                # Mantém as alterações para a próxima gravação (ou para reaplicar após uma recarga)
+                with self._lock:
+                    for projeto_id, doc in pendentes.items():
+                        self._pendentes.setdefault(projeto_id, doc)
+                    self._sujo = True
+                raise
+
+    def buscar(self, consulta, publico_alvo=None, page=1, per_page=20):
+        """Retorna (total, resultados da página) ordenados por relevância."""
+        termos = set(normalizar_termos(consulta))
+        filtro_publico = set(normalizar_termos(publico_alvo)) if publico_alvo else None
+
+        with self._lock:
+            self._recarregar_se_alterado()
+            n_docs = len(self._documentos)
+            if not n_docs or not (termos or filtro_publico):
+                return 0, []
+            media_tamanho = self._tamanho_total / n_docs
+
+            if termos:
+                pontuacao = {}
+                for termo in termos:
+                    postings = self._postings.get(termo)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for projeto_id, freq in postings.items():
+                        tamanho = self._documentos[projeto_id]['tamanho']
+                        norm = freq + BM25_K1 * (1 - BM25_B + BM25_B * tamanho / media_tamanho)
+                        pontuacao[projeto_id] = pontuacao.get(projeto_id, 0.0) + idf * freq * (BM25_K1 + 1) / norm
+
+            if filtro_publico:
+                candidatos = set.intersection(*(self._publicos.get(termo, set()) for termo in filtro_publico))
+                if termos:
+                    pontuacao = {pid: score for pid, score in pontuacao.items() if pid in candidatos}
+                else:
+                    pontuacao = dict.fromkeys(candidatos, 0.0)  # somente filtro
+
+            ordenados = sorted(pontuacao.items(), key=lambda item: (-item[1], item[0]))
+            inicio = (page - 1) * per_page
+            resultados = [
+                {
+                    'id': projeto_id,
+                    'nome_projeto': self._documentos[projeto_id]['nome_projeto'],
+                    'publico_alvo': self._documentos[projeto_id]['publico_alvo'],
+                    'score': round(score, 4),
+                }
+                for projeto_id, score in ordenados[inicio:inicio + per_page]
+            ]
+            return len(ordenados), resultados
+
+
+indice_projetos = IndiceProjetos(BUSCA_INDEX_PATH)
+atexit.register(indice_projetos.salvar)
+
+
+# =========================================================
+# 3.2 FILA DE E-MAILS DE SAÍDA (SQLITE + WORKER)
+# =========================================================
+
+class FilaEmails:
+    """
+    Fila durável de e-mails em SQLite. As rotas apenas enfileiram (uma inserção local);
+    um worker em segundo plano reserva lotes, envia por uma única conexão SMTP
+    e reagenda as falhas com backoff exponencial.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._worker = None
+        self._aviso_smtp = False
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS emails (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    destinatario TEXT NOT NULL,
+                    dados TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proxima_tentativa REAL NOT NULL,
+                    erro TEXT,
+                    criado_em REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_emails_fila ON emails (status, proxima_tentativa)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_emails_destinatario ON emails (tipo, destinatario, criado_em)')
+            conn.execute('CREATE TABLE IF NOT EXISTS limites_envio (chave TEXT NOT NULL, ts REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_limites_envio ON limites_envio (chave, ts)')
+        # Retoma pendências e reenvios agendados deixados por uma execução anterior
+        self.iniciar_worker()
+
+    def _conectar(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enfileirar(self, tipo, destinatario, janela_unica=None, **dados):
+        """
+        Grava o e-mail na fila e acorda o worker. Não faz chamadas de rede.
+        Com 'janela_unica' (segundos), não enfileira se já houver um e-mail do mesmo tipo para o
+        mesmo destinatário pendente ou criado dentro da janela. Retorna True se enfileirou.
+        """
+        agora = time.time()
+        conn = self._conectar()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if janela_unica is not None:
+                existente = conn.execute(
+                    """SELECT 1 FROM emails WHERE tipo = ? AND destinatario = ?
+                       AND (status IN ('pendente', 'enviando') OR criado_em >= ?) LIMIT 1""",
+                    (tipo, destinatario, agora - janela_unica)
+                ).fetchone()
+                if existente:
+                    conn.execute('ROLLBACK')
+                    return False
+            conn.execute(
+                'INSERT INTO emails (tipo, destinatario, dados, proxima_tentativa, criado_em) VALUES (?, ?, ?, ?, ?)',
+                (tipo, destinatario, json.dumps(dados, ensure_ascii=False), agora, agora)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        self.iniciar_worker()
+        self._acordar.set()
+        return True
+
+    def permitir(self, chave, limite, janela):
+        """Limite de frequência (ex.: por IP): registra a tentativa e retorna False se 'limite' foi excedido na janela."""
+        agora = time.time()
+        conn = self._conectar()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM limites_envio WHERE ts < ?', (agora - janela,))
+            (tentativas,) = conn.execute('SELECT COUNT(*) FROM limites_envio WHERE chave = ?', (chave,)).fetchone()
+            permitido = tentativas < limite
+            if permitido:
+                conn.execute('INSERT INTO limites_envio (chave, ts) VALUES (?, ?)', (chave, agora))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return permitido
+
+    def reservar_lote(self, limite=None):
+        """Marca até 'limite' e-mails vencidos como 'enviando' (inclui lotes abandonados há mais de EMAIL_LEASE)."""
+        limite = limite or EMAIL_LOTE
+        agora = time.time()
+        conn = self._conectar()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            linhas = conn.execute(
+                """SELECT id, tipo, destinatario, dados, tentativas FROM emails
+                   WHERE (status = 'pendente' AND proxima_tentativa <= ?)
+                      OR (status = 'enviando' AND proxima_tentativa <= ?)
+                   ORDER BY id LIMIT ?""",
+                (agora, agora - EMAIL_LEASE, limite)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE emails SET status = 'enviando', proxima_tentativa = ? WHERE id = ?",
+                [(agora, linha[0]) for linha in linhas]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return [
+            {'id': id_, 'tipo': tipo, 'destinatario': dest, 'dados': json.loads(dados), 'tentativas': tentativas}
+            for id_, tipo, dest, dados, tentativas in linhas
+        ]
+
+    def registrar_resultados(self, enviados, falhas, descartados):
+        """Marca os enviados, reagenda as falhas (backoff com jitter) e marca os descartados."""
+        agora = time.time()
+        reagendar, esgotados = [], []
+        for item, erro in falhas:
+            tentativas = item['tentativas'] + 1
+            if tentativas >= EMAIL_MAX_TENTATIVAS:
+                esgotados.append((tentativas, erro, item['id']))
+            else:
+                espera = EMAIL_BACKOFF_BASE * (2 ** item['tentativas']) * random.uniform(0.8, 1.2)
+                reagendar.append((tentativas, agora + espera, erro, item['id']))
+
+        with self._conectar() as conn:
+            conn.execute('BEGIN')
+            # Os enviados ficam registrados por EMAIL_HISTORICO (usado no controle de duplicados)
+            conn.executemany("UPDATE emails SET status = 'enviado' WHERE id = ?", [(item['id'],) for item in enviados])
+            conn.execute("DELETE FROM emails WHERE status = 'enviado' AND criado_em < ?", (agora - EMAIL_HISTORICO,))
+            conn.executemany(
+                "UPDATE emails SET status = 'pendente', tentativas = ?, proxima_tentativa = ?, erro = ? WHERE id = ?",
+                reagendar
+            )
+            conn.executemany("UPDATE emails SET status = 'falhou', tentativas = ?, erro = ? WHERE id = ?", esgotados)
+            conn.executemany(
+                "UPDATE emails SET status = 'descartado', erro = ? WHERE id = ?",
+                [(erro, item['id']) for item, erro in descartados]
+            )
+            conn.execute('COMMIT')
+
+    def processar_lote(self):
+        """Envia um lote pela mesma conexão SMTP. Retorna quantos e-mails foram reservados."""
+        lote = self.reservar_lote()
+        if not lote:
+            return 0
+
+        enviados, falhas, descartados = [], [], []
+        try:
+            smtp = _abrir_smtp()
+        except Exception as e:
+            self.registrar_resultados([], [(item, f'SMTP: {e}') for item in lote], [])
+            return len(lote)
+
+        try:
+            for item in lote:
+                try:
+                    mensagem = montar_email(item)
+                except auth.UserNotFoundError:
+                    descartados.append((item, 'Usuário não encontrado no Firebase Auth.'))
+                    continue
+                except Exception as e:
+                    falhas.append((item, str(e)))
+                    continue
+                try:
+                    smtp.send_message(mensagem)
+                    enviados.append(item)
+                except smtplib.SMTPRecipientsRefused as e:
+                    descartados.append((item, str(e)))
+                except Exception as e:
+                    falhas.append((item, str(e)))
+        finally:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+            self.registrar_resultados(enviados, falhas, descartados)
+        return len(lote)
+
+    def _loop_worker(self):
+        while not self._parar.is_set():
+            try:
+                processados = self.processar_lote()
+            except Exception as e:
+                print(f"ERRO na fila de e-mails: {e}")
+                processados = 0
+            if not processados:
+                self._acordar.wait(timeout=EMAIL_BACKOFF_BASE)
+                self._acordar.clear()
+
+    def iniciar_worker(self):
+        """Inicia (uma vez por processo) a thread que esvazia a fila, se houver SMTP configurado."""
+        if not SMTP_HOST:
+            if not self._aviso_smtp:
+                self._aviso_smtp = True
+                print(f"AVISO: SMTP_HOST não configurado. Os e-mails ficarão na fila '{self.path}' sem envio.")
+            return
+        if self._worker and self._worker.is_alive():
+            return
+        self._parar.clear()
+        self._worker = threading.Thread(target=self._loop_worker, name='fila-emails', daemon=True)
+        self._worker.start()
+
+    def parar_worker(self):
+        """Encerra a thread de envio após o lote atual (os e-mails pendentes continuam na fila)."""
+        if self._worker:
+            self._parar.set()
+            self._acordar.set()
+            self._worker.join()
+            self._worker = None
+
+
+def _abrir_smtp():
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_USE_TLS:
+        smtp.starttls()
+    if SMTP_USER:
+        smtp.login(SMTP_USER, SMTP_PASSWORD)
+    return smtp
+
+
+def montar_email(item):
+    """Monta a mensagem de acordo com o tipo. O link de redefinição é gerado aqui, fora da requisição."""
+    dados = item['dados']
+    mensagem = EmailMessage()
+    mensagem['From'] = MAIL_FROM
+    mensagem['To'] = item['destinatario']
+
+    if item['tipo'] == 'redefinir_senha':
+        link = auth.generate_password_reset_link(item['destinatario'])
+        mensagem['Subject'] = 'PC Teacher - Redefinição de senha'
+        mensagem.set_content(
+            'Olá!\n\n'
+            'Recebemos um pedido para redefinir a senha da sua conta no PC Teacher.\n'
+            f'Para criar uma nova senha, acesse: {link}\n\n'
+            'Se você não fez este pedido, ignore este e-mail.\n'
+        )
+    elif item['tipo'] == 'modulo_concluido':
+        mensagem['Subject'] = f'PC Teacher - Módulo "{dados["modulo"]}" concluído'
+        mensagem.set_content(
+            f'Olá, {dados.get("nome", "")}!\n\n'
+            f'Parabéns por concluir o módulo "{dados["modulo"]}" do curso {dados.get("curso") or "Pensamento Computacional para Professores"}.\n'
+            + (f'Próximo módulo: {dados["proximo"]}.\n' if dados.get('proximo') else 'Você finalizou o curso! Seu certificado já está disponível.\n')
+        )
+    else:
+        raise ValueError(f'Tipo de e-mail desconhecido: {item["tipo"]}')
+    return mensagem
+
+
+fila_emails = FilaEmails(EMAIL_QUEUE_PATH)
+
+
+# =========================================================
+# 3.3 REGISTRO DE ATIVIDADES (BUFFER EM MEMÓRIA + DESCARGA EM LOTE)
+# =========================================================
+
+class RegistroAtividades:
+    """
+    Log append-only de atividades (aulas abertas, tentativas de quiz, módulos concluídos).
+    registrar() apenas acrescenta o evento a um buffer circular em memória; uma thread
+    descarrega em lote ao atingir ATIVIDADES_LOTE eventos ou a cada ATIVIDADES_INTERVALO segundos.
+    A perda no desligamento fica limitada ao buffer (que também é descarregado no atexit).
+    """
+
+    DESTINOS = ('ndjson', 'firestore')
+
+    def __init__(self, destino, diretorio):
+        if destino not in self.DESTINOS:
+            raise ValueError(f"ATIVIDADES_DESTINO inválido: '{destino}' (use {' ou '.join(self.DESTINOS)}).")
+        self.destino = destino
+        self.diretorio = diretorio
+        self.descartados = 0
+        self._buffer = deque(maxlen=ATIVIDADES_CAPACIDADE)
+        self._lock_buffer = threading.Lock()
+        self._acordar = threading.Event()
+        self._lock_gravacao = threading.Lock()
+        self._worker = None
+        self._segmento = None
+
+    def registrar(self, tipo, user_id, **dados):
+        evento = dict(dados, tipo=tipo, user_id=user_id, ts=time.time())
+        with self._lock_buffer:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.descartados += 1  # buffer cheio: o evento mais antigo é sobrescrito
+            self._buffer.append(evento)
+        if self._worker is None:
+            self._iniciar_worker()
+        if len(self._buffer) >= ATIVIDADES_LOTE:
+            self._acordar.set()
+
+    def _iniciar_worker(self):
+        with self._lock_gravacao:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop_worker, name='registro-atividades', daemon=True)
+                self._worker.start()
+
+    def _loop_worker(self):
+        while True:
+            self._acordar.wait(timeout=ATIVIDADES_INTERVALO)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"ERRO ao descarregar atividades: {e}")
+
+    def descarregar(self):
+        """
+        Grava todos os eventos do buffer, em lotes de até ATIVIDADES_LOTE.
+        Se a gravação falhar, o lote volta para o início do buffer e é tentado na próxima descarga;
+        se não couber (eventos novos chegaram), os mais antigos do lote são descartados e contados.
+        """
+        with self._lock_gravacao:
+            while self._buffer:
+                eventos = []
+                while self._buffer and len(eventos) < ATIVIDADES_LOTE:
+                    eventos.append(self._buffer.popleft())
+                try:
+                    if self.destino == 'firestore':
+                        self._gravar_firestore(eventos)
+                    else:
+                        self._gravar_ndjson(eventos)
+                except Exception:
+                    with self._lock_buffer:
+                        espaco = self._buffer.maxlen - len(self._buffer)
+                        perdidos = max(0, len(eventos) - espaco)
+                        self.descartados += perdidos
+                        self._buffer.extendleft(reversed(eventos[perdidos:]))
+                    raise
+
+    def _gravar_firestore(self, eventos):
+        for inicio in range(0, len(eventos), FIRESTORE_MAX_BATCH):
+            batch = db.batch()
+            for evento in eventos[inicio:inicio + FIRESTORE_MAX_BATCH]:
+                batch.set(db.collection('atividades').document(), evento)
+            batch.commit()
+
+    def _gravar_ndjson(self, eventos):
+        if (self._segmento is None or not os.path.exists(self._segmento)
+                or os.path.getsize(self._segmento) >= ATIVIDADES_SEGMENTO_BYTES):
+            os.makedirs(self.diretorio, exist_ok=True)
+            nome = f"atividades-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.ndjson"
+            self._segmento = os.path.join(self.diretorio, nome)
+        with open(self._segmento, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(evento, ensure_ascii=False) + '\n' for evento in eventos))
+
+
+registro_atividades = RegistroAtividades(ATIVIDADES_DESTINO, ATIVIDADES_DIR)
+atexit.register(registro_atividades.descarregar)
+
+
 # =========================================================
 # 4. ROTAS DE AUTENTICAÇÃO
 # (Mantidas as rotas de autenticação)
@@ -388,19 +1477,13 @@ def cadastro():
                 'decomposicao': '',
                 'rec_padrao': '', # CHAVE AJUSTADA
                 'abstracao': '',
-                'algoritmo': ''
+                'algoritmo': '',
+                'schema_version': PROJETOS_SCHEMA_VERSION
             }
             db.collection('projetos').document(user_id).set(novo_projeto_data)
             
             # Cria um registro de progresso (Coleção 'progresso')
-            novo_progresso_data = {
-                'introducao_concluido': False,
-                'decomposicao_concluido': False,
-                'reconhecimento_padroes_concluido': False,
-                'abstracao_concluido': False,
-                'algoritmo_concluido': False,
-                'projeto_final_concluido': False,
-            }
+            novo_progresso_data = dict(catalogo_cursos.curso().progresso_inicial)
             db.collection('progresso').document(user_id).set(novo_progresso_data)
 
             flash('Cadastro realizado com sucesso! Faça login para começar.', 'success')
@@ -441,6 +1524,51 @@ def login():
 
     return render_template('login.html', user=usuario)
 
+MENSAGEM_RECUPERACAO = 'Se o e-mail estiver cadastrado, você receberá em instantes um link para redefinir sua senha.'
+
+MENSAGEM_LIMITE_RECUPERACAO = 'Muitas solicitações. Aguarde alguns minutos e tente novamente.'
+
+def _enfileirar_recuperacao(email):
+    """
+    Valida o e-mail e enfileira a redefinição. Retorna 'invalido', 'limite' ou 'ok'.
+    Um endereço recebe no máximo um pedido por RECUPERACAO_JANELA (pedidos repetidos também
+    respondem 'ok', para não revelar contas) e cada IP faz até RECUPERACAO_LIMITE_IP pedidos por hora.
+    """
+    email = (email or '').strip().lower()
+    if not re.fullmatch(r'[^@\s]+@[^@\s]+\.[^@\s]+', email):
+        return 'invalido'
+    if not fila_emails.permitir(f'recuperacao:{request.remote_addr}', RECUPERACAO_LIMITE_IP, 3600):
+        return 'limite'
+    fila_emails.enfileirar('redefinir_senha', email, janela_unica=RECUPERACAO_JANELA)
+    return 'ok'
+
+@app.route('/esqueci-senha', methods=['GET', 'POST'])
+def esqueci_senha():
+    if request.method == 'POST':
+        email = request.form.get('email')
+        resultado = _enfileirar_recuperacao(email)
+        if resultado == 'ok':
+            flash(MENSAGEM_RECUPERACAO, 'success')
+            return redirect(url_for('esqueci_senha'))
+        if resultado == 'limite':
+            flash(MENSAGEM_LIMITE_RECUPERACAO, 'error')
+        else:
+            flash('Informe um e-mail válido.', 'error')
+        return render_template('esqueci_senha.html', email_for_form=email)
+
+    return render_template('esqueci_senha.html')
+
+@app.route('/recuperar_senha', methods=['POST'])
+def recuperar_senha():
+    """Versão JSON de 'esqueci_senha', usada pelo formulário via fetch."""
+    data = request.get_json(silent=True) or {}
+    resultado = _enfileirar_recuperacao(data.get('email'))
+    if resultado == 'limite':
+        return jsonify({'success': False, 'message': MENSAGEM_LIMITE_RECUPERACAO}), 429
+    if resultado == 'invalido':
+        return jsonify({'success': False, 'message': 'Informe um e-mail válido.'}), 400
+    return jsonify({'success': True, 'message': MENSAGEM_RECUPERACAO}), 202
+
 @app.route('/logout')
 def logout():
     """Remove o ID da sessão e redireciona para a página inicial."""
@@ -588,12 +1716,20 @@ def certificado():
     certificado_disponivel = progresso_data['overall_percent'] == 100
     data_emissao = datetime.now().strftime('%d/%m/%Y')
     
+    # Registra o certificado assim que fica disponível, para que o código exibido já seja verificável
+    if certificado_disponivel:
+        try:
+            registrar_certificados([(usuario['id'], usuario['nome'])], data_emissao)
+        except Exception as e:
+            print(f"AVISO: Certificado de '{usuario['id']}' não registrado para verificação: {e}")
+    
     context = {
         'user': usuario,
         'title': "Certificado",
         'certificado_disponivel': certificado_disponivel,
         'nome_usuario': usuario['nome'], 
-        'data_emissao': data_emissao
+        'data_emissao': data_emissao,
+        'codigo_certificado': codigo_certificado(usuario['id']) if certificado_disponivel else None
     }
     return render_template('certificado.html', **context)
 
@@ -609,10 +1745,16 @@ def gerar_certificado():
         return redirect(url_for('certificado'))
 
     nome_completo = usuario['nome'].upper()
-    data_conclusao_str = datetime.now().strftime('%d de \%B de \%Y')
-    carga_horaria = 24 
+    data_conclusao_str = data_por_extenso(datetime.now())
+    codigo = codigo_certificado(usuario['id'])
+    
+    # Registra o certificado no índice público de verificação
+    registrar_certificados([(usuario['id'], usuario['nome'])], datetime.now().strftime('%d/%m/%Y'))
     
-    latex_content = generate_latex_certificate(nome_completo, data_conclusao_str, carga_horaria)
+    latex_content = generate_latex_certificate(
+        nome_completo, data_conclusao_str, CARGA_HORARIA_CERTIFICADO, codigo,
+        url_verificacao_certificado(codigo), catalogo_cursos.curso().titulo
+    )
     
     return Response(
         latex_content,
@@ -621,6 +1763,51 @@ def gerar_certificado():
     )
 
 
+@app.route('/certificados/verificar/<string:codigo>')
+def verificar_certificado(codigo):
+    """
+    Verificação pública: confere a assinatura do código (sem acesso ao banco) e faz
+    uma única leitura no índice 'certificados'. A resposta pode ser cacheada.
+    """
+    certificado_id = validar_codigo_certificado(codigo)
+    if not certificado_id:
+        response = jsonify({'valido': False, 'message': 'Código de certificado inválido.'})
+        response.status_code = 404
+        response.headers['Cache-Control'] = f'public, max-age={CERTIFICADO_CACHE_MAX_AGE}'
+        return response
+
+    certificado_data = get_firestore_doc('certificados', certificado_id)
+    if not certificado_data:
+        # O certificado pode ser emitido depois: cache curto
+        response = jsonify({'valido': False, 'message': 'Certificado não encontrado.'})
+        response.status_code = 404
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
+
+    response = jsonify({
+        'valido': True,
+        'codigo': codigo.strip().upper(),
+        'nome': certificado_data.get('nome'),
+        'curso': certificado_data.get('curso'),
+        'carga_horaria': certificado_data.get('carga_horaria'),
+        'data_emissao': certificado_data.get('data_emissao'),
+    })
+    response.headers['Cache-Control'] = f'public, max-age={CERTIFICADO_CACHE_MAX_AGE}'
+    return response
+
+
+@app.route('/admin/certificados.zip')
+@requires_admin
+def certificados_turma():
+    """Baixa os certificados de todos os concluintes como um ZIP gerado sob demanda (streaming)."""
+    nome_zip = f"Certificados_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_with_context(chunk for chunk in gerar_zip_certificados(listar_concluintes()) if chunk),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={nome_zip}'}
+    )
+
+
 # =========================================================
 # 7. ROTAS DE GERENCIAMENTO DE PROJETOS (REVISADAS)
 # =========================================================
@@ -634,6 +1821,11 @@ def salvar_projeto():
     """
     usuario = usuario_logado()
     user_id = usuario['id']
+
+    # Salvamentos da fila offline levam o dono: com outro usuário logado no navegador, ficam retidos
+    dono = request.headers.get('X-Usuario-Id')
+    if dono and dono != user_id:
+        return jsonify({'success': False, 'outro_usuario': True, 'message': 'Este salvamento pertence a outro usuário.'}), 409
     
     data = request.form.to_dict() # Captura todos os dados do formulário
     
@@ -652,9 +1844,36 @@ def salvar_projeto():
         flash('Nenhum dado válido enviado para salvar o projeto.', 'warning')
         return redirect(request.referrer or url_for('dashboard')) 
 
+    chave_idempotencia = request.headers.get('Idempotency-Key')
+    if chave_idempotencia is not None and not IDEMPOTENCIA_KEY_RE.fullmatch(chave_idempotencia):
+        return jsonify({'success': False, 'message': 'Idempotency-Key inválida.'}), 400
+
     try:
-        # Atualiza o documento de projeto.
-        db.collection('projetos').document(user_id).update(update_data)
+        projeto_ref = db.collection('projetos').document(user_id)
+
+        if chave_idempotencia:
+            # Registra a chave e atualiza o projeto na mesma escrita atômica:
+            # se a chave já existe (salvamento reenviado), nada é aplicado.
+            batch = db.batch()
+            batch.create(db.collection('idempotencia').document(f'{user_id}_{chave_idempotencia}'), {
+                'user_id': user_id,
+                'expira_em': datetime.utcnow() + IDEMPOTENCIA_TTL,
+            })
+            batch.update(projeto_ref, update_data)
+            try:
+                batch.commit()
+            except AlreadyExists:
+                if request.is_json or request.accept_mimetypes.accept_json:
+                    return jsonify({'success': True, 'duplicado': True, 'message': 'Salvamento já aplicado.'})
+                flash('Dados do projeto salvos com sucesso!', 'success')
+                return redirect(request.referrer or url_for('dashboard'))
+        else:
+            # Atualiza o documento de projeto.
+            projeto_ref.update(update_data)
+
+        # Atualiza o índice de busca com o projeto já carregado + alterações (sem nova leitura)
+        projeto_atual = dict(usuario.get('projeto', {}), **update_data)
+        indice_projetos.atualizar(user_id, projeto_atual)
         
         # Resposta otimizada para chamadas AJAX (salvamento automático)
         if request.is_json or request.accept_mimetypes.accept_json:
@@ -670,6 +1889,25 @@ def salvar_projeto():
         return redirect(request.referrer or url_for('dashboard'))
 
 
+@app.route('/admin/projetos/busca')
+@requires_admin
+def buscar_projetos():
+    """Busca paginada e ranqueada nos projetos finais (parâmetros: q, publico_alvo, page, per_page)."""
+    consulta = request.args.get('q', '')
+    publico_alvo = request.args.get('publico_alvo')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    total, resultados = indice_projetos.buscar(consulta, publico_alvo=publico_alvo, page=page, per_page=per_page)
+    return jsonify({
+        'q': consulta,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'resultados': resultados,
+    })
+
+
 # =========================================================
 # 7.1. ROTA DE DOWNLOAD PDF (NOVA)
 # =========================================================
@@ -741,51 +1979,141 @@ def modulos():
     return render_template('modulos.html', user=usuario, modulos=modulos_list, progresso_data=progresso_data)
 
 
+@firestore.transactional
+def _concluir_modulo_transacao(transaction, progresso_ref, db_field, dependency_field, progresso_inicial):
+    """
+    Lê apenas os campos necessários do progresso e marca o módulo como concluído na mesma transação.
+    Retorna 'concluido', 'ja_concluido' ou 'dependencia_pendente'.
+    Se outra requisição concluir o módulo ao mesmo tempo, a transação é repetida e vê o valor novo.
+    Um documento de progresso ausente (conta antiga) é criado a partir de progresso_inicial.
+    """
+    campos = [db_field] + ([dependency_field] if dependency_field else [])
+    snapshot = progresso_ref.get(field_paths=campos, transaction=transaction)
+    progresso = (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+    if progresso.get(db_field, False):
+        return 'ja_concluido'
+    if dependency_field and not progresso.get(dependency_field, False):
+        return 'dependencia_pendente'
+
+    if snapshot.exists:
+        transaction.update(progresso_ref, {db_field: True})
+    else:
+        transaction.create(progresso_ref, dict(progresso_inicial, **{db_field: True}))
+    return 'concluido'
+
+
 @app.route('/concluir-modulo/<string:modulo_nome>', methods=['POST'])
-@requires_auth
+@requires_session
 def concluir_modulo(modulo_nome):
-    usuario = usuario_logado()
-    user_id = usuario['id']
-    progresso = usuario.get('progresso', {}) 
+    user_id = session['usuario_id']
     
+    curso = catalogo_cursos.curso()
     slug_normalizado = modulo_nome.replace('_', '-')
-    modulo_config = MODULO_BY_SLUG.get(slug_normalizado)
+    modulo_config = curso.por_slug.get(slug_normalizado)
     
     if not modulo_config:
         flash(f'Erro: Módulo "{modulo_nome}" não encontrado no mapeamento.', 'danger')
         return redirect(url_for('modulos'))
 
     db_field = modulo_config['field']
-    
-    # 1. VERIFICA DEPENDÊNCIA
     dependency_field = modulo_config.get('dependency_field')
-    if dependency_field and not progresso.get(dependency_field, False):
-        flash('Você deve completar o módulo anterior primeiro para registrar a conclusão deste.', 'warning')
-        return redirect(url_for('modulos'))
 
-    # 2. ATUALIZA o campo de progresso no Firestore
+    # 1. VERIFICA A DEPENDÊNCIA E ATUALIZA o progresso em uma única transação
     try:
         progresso_ref = db.collection('progresso').document(user_id)
-        
-        progresso_ref.update({
-            db_field: True
-        })
-        
-        # Lógica de redirecionamento
-        proximo_modulo_order = modulo_config['order'] + 1
-        proximo_modulo = next((m for m in MODULO_CONFIG if m['order'] == proximo_modulo_order), None)
-        
-        if proximo_modulo:
-            flash(f'Módulo "{modulo_config["title"]}" concluído com sucesso! Prossiga para o próximo: {proximo_modulo["title"]}', 'success')
-        else:
-            flash(f'Módulo "{modulo_config["title"]}" concluído com sucesso! Você finalizou o curso!', 'success')
-        
+        resultado = _concluir_modulo_transacao(
+            db.transaction(), progresso_ref, db_field, dependency_field, curso.progresso_inicial
+        )
     except Exception as e:
         flash(f'Erro ao concluir o módulo: {e}', 'danger')
+        return redirect(url_for('modulos'))
+
+    if resultado == 'dependencia_pendente':
+        flash('Você deve completar o módulo anterior primeiro para registrar a conclusão deste.', 'warning')
+        return redirect(url_for('modulos'))
+    if resultado == 'ja_concluido':
+        # Clique duplo ou outra aba: nada é gravado nem notificado novamente
+        flash(f'O módulo "{modulo_config["title"]}" já estava concluído.', 'info')
+        return redirect(url_for('modulos'))
+
+    # 2. Lógica de redirecionamento
+    proximo_modulo = curso.proximo[modulo_config['slug']]
+
+    if proximo_modulo:
+        flash(f'Módulo "{modulo_config["title"]}" concluído com sucesso! Prossiga para o próximo: {proximo_modulo["title"]}', 'success')
+    else:
+        flash(f'Módulo "{modulo_config["title"]}" concluído com sucesso! Você finalizou o curso!', 'success')
+
+    registro_atividades.registrar('modulo_concluido', user_id, modulo=modulo_config['slug'])
+
+    # 3. Notificação por e-mail (o usuário só é lido quando o módulo é de fato concluído)
+    try:
+        usuario = get_firestore_doc('usuarios', user_id)
+        if usuario and usuario.get('email'):
+            fila_emails.enfileirar(
+                'modulo_concluido', usuario['email'],
+                nome=usuario.get('nome', ''),
+                curso=curso.titulo,
+                modulo=modulo_config['title'],
+                proximo=proximo_modulo['title'] if proximo_modulo else None
+            )
+    except Exception as e:
+        print(f"AVISO: Notificação de conclusão não enfileirada: {e}")
         
     return redirect(url_for('modulos'))
 
 
+ATIVIDADE_MAX_BYTES = 2048
+ATIVIDADE_QUESTAO_MAX = 64
+ATIVIDADE_SEGUNDOS_MAX = 4 * 3600
+
+
+def _validar_modulo(valor):
+    return valor if isinstance(valor, str) and valor in catalogo_cursos.curso().por_slug else None
+
+def _validar_questao(valor):
+    return valor[:ATIVIDADE_QUESTAO_MAX] if isinstance(valor, str) and valor else None
+
+def _validar_correta(valor):
+    return valor if isinstance(valor, bool) else None
+
+def _validar_segundos(valor):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return None
+    return int(min(max(valor, 0), ATIVIDADE_SEGUNDOS_MAX))
+
+# Campos aceitos por tipo de evento do cliente e seus validadores (todos obrigatórios)
+ATIVIDADES_CLIENTE = {
+    'quiz_tentativa': {'modulo': _validar_modulo, 'questao': _validar_questao, 'correta': _validar_correta},
+    'tempo_aula': {'modulo': _validar_modulo, 'segundos': _validar_segundos},
+}
+
+@app.route('/atividade', methods=['POST'])
+def registrar_atividade():
+    """
+    Recebe eventos enviados pelas páginas de aula (navigator.sendBeacon) e os coloca no buffer.
+    Usa só a sessão (sem o requires_auth) para não fazer leituras no Firestore a cada evento.
+    """
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autenticado.'}), 401
+
+    if request.content_length is None or request.content_length > ATIVIDADE_MAX_BYTES:
+        return jsonify({'success': False, 'message': 'Evento muito grande.'}), 413
+
+    data = request.get_json(silent=True, force=True)
+    if not isinstance(data, dict) or data.get('tipo') not in ATIVIDADES_CLIENTE:
+        return jsonify({'success': False, 'message': 'Tipo de atividade inválido.'}), 400
+
+    tipo = data['tipo']
+    dados = {campo: validar(data.get(campo)) for campo, validar in ATIVIDADES_CLIENTE[tipo].items()}
+    if any(valor is None for valor in dados.values()):
+        return jsonify({'success': False, 'message': 'Dados de atividade inválidos.'}), 400
+
+    registro_atividades.registrar(tipo, session['usuario_id'], **dados)
+    return '', 204
+
+
 @app.route('/conteudo/<string:modulo_slug>')
 @requires_auth
 def conteudo_dinamico(modulo_slug):
@@ -793,7 +2121,7 @@ def conteudo_dinamico(modulo_slug):
     progresso = usuario.get('progresso', {})
     projeto_data = usuario.get('projeto', {}) # Pega os dados do projeto
     
-    modulo_config = MODULO_BY_SLUG.get(modulo_slug)
+    modulo_config = catalogo_cursos.curso().por_slug.get(modulo_slug)
 
     if not modulo_config:
         flash('Módulo de conteúdo não encontrado.', 'danger')
@@ -805,6 +2133,10 @@ def conteudo_dinamico(modulo_slug):
         flash(f'Você deve completar o módulo anterior primeiro.', 'warning')
         return redirect(url_for('modulos'))
         
+    # Buscas antecipadas do Service Worker (X-Precache) não são visualizações da aula
+    if not request.headers.get('X-Precache') and request.headers.get('Sec-Purpose') != 'prefetch':
+        registro_atividades.registrar('aula_aberta', usuario['id'], modulo=modulo_slug)
+
     # 2. Renderiza o template do módulo
     template_name = modulo_config['template']
     
@@ -837,12 +2169,83 @@ def get_firebase_client_config():
     }
 
 
+@app.route('/sw.js')
+def service_worker():
+    """Serve o Service Worker na raiz para que seu escopo cubra todo o site."""
+    response = send_from_directory(os.path.join(app.static_folder, 'js'), 'sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @app.context_processor
 def inject_globals():
     """Injeta variáveis que devem estar disponíveis em todos os templates."""
     return dict(firebase_config=get_firebase_client_config())
 
 
+# =========================================================
+# 8.1 COMANDOS DE LINHA DE COMANDO (flask <comando>)
+# =========================================================
+
+@app.cli.command('gerar-certificados')
+@click.argument('destino', default='certificados.zip')
+@click.option('--site-url', default=SITE_URL, help='Raiz do site impressa nos links de verificação (padrão: SITE_URL).')
+def gerar_certificados_cmd(destino, site_url):
+    """Gera os certificados de todos os concluintes em um arquivo ZIP."""
+    # Fora de uma requisição não há host para montar o link: sem a raiz, ele sairia relativo
+    site_url = (site_url or '').rstrip('/')
+    if not site_url.startswith(('http://', 'https://')):
+        raise click.UsageError('Defina SITE_URL (ou --site-url) com a URL pública do site, ex.: https://pcteacher.com.br')
+    with open(destino, 'wb') as f:
+        for chunk in gerar_zip_certificados(listar_concluintes(), url_base=site_url):
+            f.write(chunk)
+    print(f"INFO: Certificados gravados em '{destino}'.")
+
+
+@app.cli.command('migrar-projetos')
+@click.option('--dry-run', is_flag=True, help='Apenas conta os documentos que seriam migrados.')
+@click.option('--desde', default=None, help='Retoma a migração após este ID de documento.')
+def migrar_projetos_cmd(dry_run, desde):
+    """Migra os documentos de 'projetos' para o esquema atual."""
+    examinados, migrados, ultimo_id = migrar_projetos(dry_run=dry_run, desde=desde)
+    modo = 'seriam migrados' if dry_run else 'migrados'
+    print(f"INFO: {examinados} projetos examinados, {migrados} {modo} (versão {PROJETOS_SCHEMA_VERSION}, último ID: {ultimo_id}).")
+
+
+@app.cli.command('processar-emails')
+@click.option('--continuo', is_flag=True, help='Continua aguardando novos e-mails em vez de sair com a fila vazia.')
+def processar_emails_cmd(continuo):
+    """Envia os e-mails pendentes da fila (útil para rodar o worker em um processo separado)."""
+    total = 0
+    while True:
+        processados = fila_emails.processar_lote()
+        total += processados
+        if not processados:
+            if not continuo:
+                break
+            time.sleep(EMAIL_BACKOFF_BASE)
+    print(f"INFO: {total} e-mails processados.")
+
+
+@app.cli.command('indexar-projetos')
+def indexar_projetos_cmd():
+    """Reconstrói o índice de busca a partir de todos os documentos de 'projetos'."""
+    # Constrói em um arquivo separado e só então substitui o índice atual; os servidores
+    # em execução percebem a troca pelo mtime e recarregam.
+    novo_path = f'{BUSCA_INDEX_PATH}.novo'
+    if os.path.exists(novo_path):
+        os.remove(novo_path)
+    novo_indice = IndiceProjetos(novo_path, gravacao_automatica=False)
+    total = 0
+    for doc in db.collection('projetos').stream():
+        novo_indice.atualizar(doc.id, doc.to_dict())
+        total += 1
+    novo_indice._sujo = True
+    novo_indice.salvar()
+    os.replace(novo_path, BUSCA_INDEX_PATH)
+    print(f"INFO: {total} projetos indexados em '{BUSCA_INDEX_PATH}'.")
+
+
 # =========================================================
 # 9. EXECUÇÃO
 # =========================================================
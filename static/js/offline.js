@@ -0,0 +1,42 @@
+/**
+ * Registro do Service Worker (/sw.js) e integração com as páginas de aula.
+ * - Na página de módulos, pede ao Service Worker para guardar as aulas liberadas.
+ * - Ao voltar a conexão, pede o reenvio dos salvamentos pendentes.
+ * - Cada mensagem leva o usuário da sessão (data-usuario da tag <script>), para que o
+ *   Service Worker não misture páginas e salvamentos de professores diferentes.
+ */
+(function () {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+
+    const usuario = (document.currentScript && document.currentScript.dataset.usuario) || null;
+
+    function enviarMensagem(mensagem) {
+        navigator.serviceWorker.ready.then((registration) => {
+            if (registration.active) {
+                registration.active.postMessage(Object.assign({ usuario }, mensagem));
+            }
+        });
+    }
+
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch((error) => {
+            console.error('Falha ao registrar o Service Worker:', error);
+        });
+
+        const linksAulas = document.querySelectorAll('a[href^="/conteudo/"]');
+        if (linksAulas.length) {
+            const urls = Array.from(new Set(Array.from(linksAulas, (link) => link.getAttribute('href'))));
+            enviarMensagem({ tipo: 'precache-aulas', urls });
+        }
+
+        if (navigator.onLine) {
+            enviarMensagem({ tipo: 'sincronizar' });
+        } else {
+            enviarMensagem({ tipo: 'sessao' });
+        }
+    });
+
+    window.addEventListener('online', () => enviarMensagem({ tipo: 'sincronizar' }));
+})();
@@ -0,0 +1,356 @@
+/**
+ * Service Worker do PC Teacher.
+ * - Pré-carrega os arquivos estáticos usados pelas aulas (CSS e imagens).
+ * - Guarda em cache apenas as páginas de aula e de módulos (rede primeiro, cache quando offline).
+ * - No logout, apaga as páginas guardadas e a fila de salvamentos (computadores compartilhados).
+ *   As páginas informam o usuário da sessão; se ele mudar, as páginas guardadas do anterior são apagadas.
+ * - Enfileira os salvamentos automáticos do projeto no IndexedDB e os reenvia,
+ *   em ordem, para /projeto/salvar quando a conexão volta.
+ *   Cada salvamento leva um cabeçalho Idempotency-Key para ser aplicado uma única vez e
+ *   o X-Usuario-Id do dono: salvamentos de outro usuário ficam retidos até ele entrar de novo.
+ */
+
+const CACHE_VERSION = 'pcteacher-v3'; // Nova versão descarta os caches antigos no 'activate'
+const STATIC_CACHE = `${CACHE_VERSION}-static`;
+const PAGES_CACHE = `${CACHE_VERSION}-paginas`;
+const CDN_CACHE = `${CACHE_VERSION}-cdn`;
+
+const PRECACHE_URLS = [
+    '/static/css/dashboard.css',
+    '/static/css/modulos.css',
+    '/static/css/conteudo-aula.css',
+    '/static/css/progresso.css',
+    '/static/img/logo-black.png',
+    '/static/img/logo-icon.png',
+    '/static/img/IADES-2022.png',
+    '/static/img/Decomposicao.png',
+    '/static/img/recpadrao.png',
+    '/static/img/abstracao.png',
+    '/static/img/algoritmo.png',
+    '/static/js/offline.js',
+];
+
+// Hosts externos usados pelos templates de aula (Tailwind, fontes, ícones, Firebase)
+const CDN_HOSTS = [
+    'cdn.tailwindcss.com',
+    'fonts.googleapis.com',
+    'fonts.gstatic.com',
+    'cdnjs.cloudflare.com',
+    'www.gstatic.com',
+];
+
+const SAVE_PATH = '/projeto/salvar';
+const LOGOUT_PATH = '/logout';
+const DB_NAME = 'pcteacher-offline';
+const DB_VERSION = 2;
+const STORE_NAME = 'salvamentos';
+const SESSAO_STORE = 'sessao';
+const SYNC_TAG = 'sincronizar-projeto';
+
+
+// =========================================================
+// 1. CICLO DE VIDA
+// =========================================================
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then((cache) => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((keys) => Promise.all(
+                keys.filter((key) => !key.startsWith(CACHE_VERSION)).map((key) => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+
+// =========================================================
+// 2. ESTRATÉGIAS DE CACHE
+// =========================================================
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (request.method === 'POST' && url.origin === self.location.origin && url.pathname === SAVE_PATH) {
+        event.respondWith(enfileirarSalvamento(request));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    if (url.origin === self.location.origin && url.pathname === LOGOUT_PATH) {
+        event.respondWith(limparDadosUsuario().then(() => fetch(request)));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(request, STATIC_CACHE));
+    } else if (url.origin === self.location.origin && request.mode === 'navigate' && isPaginaDeAula(url)) {
+        event.respondWith(networkFirst(request, PAGES_CACHE));
+    } else if (CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(staleWhileRevalidate(request, CDN_CACHE));
+    }
+});
+
+// Somente as telas de aula são guardadas; perfil, progresso e áreas administrativas nunca vão para o cache.
+function isPaginaDeAula(url) {
+    return url.pathname === '/modulos' || url.pathname.startsWith('/conteudo/');
+}
+
+function isPaginaCacheavel(response) {
+    const disposition = response.headers.get('Content-Disposition') || '';
+    return response.ok && !response.redirected && !disposition.startsWith('attachment');
+}
+
+async function limparDadosUsuario() {
+    await caches.delete(PAGES_CACHE);
+    await operacaoFila('readwrite', (store) => store.clear());
+    await operacaoFila('readwrite', (store) => store.delete('usuario'), SESSAO_STORE);
+}
+
+function obterUsuario() {
+    return operacaoFila('readonly', (store) => store.get('usuario'), SESSAO_STORE);
+}
+
+// Trocas de usuário em sequência, para que a limpeza termine antes de guardar novas páginas.
+let trocaUsuario = Promise.resolve();
+
+function definirUsuario(usuario) {
+    trocaUsuario = trocaUsuario.catch(() => {}).then(async () => {
+        if (!usuario || (await obterUsuario()) === usuario) {
+            return;
+        }
+        // Outro professor no mesmo navegador: as páginas guardadas trazem o projeto do anterior.
+        await caches.delete(PAGES_CACHE);
+        await operacaoFila('readwrite', (store) => store.put(usuario, 'usuario'), SESSAO_STORE);
+    });
+    return trocaUsuario;
+}
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request, cacheName) {
+    try {
+        const response = await fetch(request);
+        // Só guarda páginas de aula efetivamente renderizadas (não os redirecionamentos para o login)
+        if (isPaginaCacheavel(response)) {
+            const cache = await caches.open(cacheName);
+            cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function staleWhileRevalidate(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    const network = fetch(request)
+        .then((response) => {
+            if (response.ok || response.type === 'opaque') {
+                cache.put(request, response.clone());
+            }
+            return response;
+        })
+        .catch(() => cached);
+    return cached || network;
+}
+
+// A página de módulos envia as URLs das aulas liberadas para serem guardadas com antecedência.
+// Aulas já presentes no cache não são buscadas de novo (cada busca custa leituras no Firestore).
+async function precacheAulas(urls) {
+    const cache = await caches.open(PAGES_CACHE);
+    await Promise.all(urls.map(async (url) => {
+        if (!isPaginaDeAula(new URL(url, self.location.origin)) || await cache.match(url)) {
+            return;
+        }
+        try {
+            // X-Precache: o servidor não conta esta busca como visualização da aula
+            const response = await fetch(url, { credentials: 'same-origin', headers: { 'X-Precache': '1' } });
+            if (isPaginaCacheavel(response)) {
+                await cache.put(url, response);
+            }
+        } catch (error) {
+            // Sem conexão: a aula será guardada na próxima visita.
+        }
+    }));
+}
+
+
+// =========================================================
+// 3. FILA DE SALVAMENTOS (INDEXEDDB)
+// =========================================================
+
+function abrirBanco() {
+    return new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => {
+            const db = req.result;
+            if (!db.objectStoreNames.contains(STORE_NAME)) {
+                db.createObjectStore(STORE_NAME, { keyPath: 'seq', autoIncrement: true });
+            }
+            if (!db.objectStoreNames.contains(SESSAO_STORE)) {
+                db.createObjectStore(SESSAO_STORE);
+            }
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+async function operacaoFila(modo, operacao, nomeStore = STORE_NAME) {
+    const db = await abrirBanco();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(nomeStore, modo);
+        const req = operacao(tx.objectStore(nomeStore));
+        tx.oncomplete = () => resolve(req.result);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function enfileirarSalvamento(request) {
+    const usuario = request.headers.get('X-Usuario-Id');
+    if (!usuario) {
+        return fetch(request); // Sem dono conhecido, o salvamento não entra na fila.
+    }
+    const formData = await request.formData();
+    const campos = [];
+    for (const [nome, valor] of formData.entries()) {
+        if (typeof valor === 'string') {
+            campos.push([nome, valor]);
+        }
+    }
+    const chave = request.headers.get('Idempotency-Key') || self.crypto.randomUUID();
+    await operacaoFila('readwrite', (store) => store.add({ chave, usuario, campos, criado_em: Date.now() }));
+    if (!(await obterUsuario())) {
+        // Nenhuma página informou a sessão ainda (ex.: logo após a instalação); o servidor
+        // confere o X-Usuario-Id no reenvio de qualquer forma.
+        await definirUsuario(usuario);
+    }
+
+    const { resultados, sessaoExpirada, retidos } = await sincronizarFila();
+    if (resultados.has(chave)) {
+        return resultados.get(chave);
+    }
+    if (retidos.has(chave)) {
+        // Outro usuário entrou neste navegador: o salvamento espera o dono fazer login de novo.
+        return new Response(
+            JSON.stringify({ success: false, queued: true, outro_usuario: true, message: 'Outro usuário entrou neste navegador. Faça login novamente para enviar as alterações guardadas no dispositivo.' }),
+            { status: 409, headers: { 'Content-Type': 'application/json' } }
+        );
+    }
+    if (sessaoExpirada) {
+        // Online, mas sem sessão: a página precisa pedir um novo login (os dados ficam na fila).
+        return new Response(
+            JSON.stringify({ success: false, queued: true, sessao_expirada: true, message: 'Sua sessão expirou. Faça login novamente para enviar as alterações guardadas no dispositivo.' }),
+            { status: 401, headers: { 'Content-Type': 'application/json' } }
+        );
+    }
+
+    if (self.registration.sync) {
+        self.registration.sync.register(SYNC_TAG).catch(() => {});
+    }
+    return new Response(
+        JSON.stringify({ success: true, queued: true, message: 'Sem conexão: salvo no dispositivo e será enviado quando a conexão voltar.' }),
+        { status: 202, headers: { 'Content-Type': 'application/json' } }
+    );
+}
+
+// Garante um único reenvio por vez, preservando a ordem da fila.
+let sincronizacaoEmAndamento = Promise.resolve({ resultados: new Map(), sessaoExpirada: false, retidos: new Set() });
+
+function sincronizarFila() {
+    sincronizacaoEmAndamento = sincronizacaoEmAndamento.catch(() => {}).then(enviarPendentes);
+    return sincronizacaoEmAndamento;
+}
+
+async function enviarPendentes() {
+    const resultados = new Map();
+    const retidos = new Set();
+    let sessaoExpirada = false;
+    const usuario = await obterUsuario();
+    const pendentes = await operacaoFila('readonly', (store) => store.getAll());
+
+    for (const item of pendentes) {
+        if (!item.usuario) {
+            // Item de uma versão anterior, sem dono: não pode ser enviado com segurança.
+            await operacaoFila('readwrite', (store) => store.delete(item.seq));
+            continue;
+        }
+        if (item.usuario !== usuario) {
+            retidos.add(item.chave);
+            continue;
+        }
+
+        let response;
+        try {
+            response = await fetch(SAVE_PATH, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: { 'Accept': 'application/json', 'Idempotency-Key': item.chave, 'X-Usuario-Id': item.usuario },
+                body: new URLSearchParams(item.campos),
+            });
+        } catch (error) {
+            break; // Ainda offline: mantém este e os seguintes na fila.
+        }
+
+        const isJson = (response.headers.get('Content-Type') || '').includes('application/json');
+        if (response.redirected || (!isJson && response.ok)) {
+            sessaoExpirada = true; // Redirecionado para o login: tenta de novo após um novo login.
+            break;
+        }
+        if (!isJson || response.status >= 500) {
+            break; // Erro do servidor: tenta de novo depois.
+        }
+        if (response.status === 409) {
+            retidos.add(item.chave); // A sessão é de outro usuário: espera o dono entrar de novo.
+            continue;
+        }
+
+        // 2xx (aplicado ou já aplicado) e 4xx (dados inválidos) saem da fila.
+        await operacaoFila('readwrite', (store) => store.delete(item.seq));
+        resultados.set(item.chave, response);
+    }
+    return { resultados, sessaoExpirada, retidos };
+}
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(sincronizarFila());
+    }
+});
+
+// Toda mensagem das páginas traz o usuário da sessão (ver offline.js).
+self.addEventListener('message', (event) => {
+    const data = event.data || {};
+    const usuarioDefinido = definirUsuario(data.usuario);
+    if (data.tipo === 'sincronizar') {
+        event.waitUntil(usuarioDefinido.then(sincronizarFila));
+    } else if (data.tipo === 'precache-aulas' && Array.isArray(data.urls)) {
+        event.waitUntil(usuarioDefinido.then(() => precacheAulas(data.urls)));
+    } else {
+        event.waitUntil(usuarioDefinido);
+    }
+});
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+# Isola os arquivos locais (fila de e-mails, índice de busca, atividades) antes de importar o app
+_TMP = tempfile.mkdtemp(prefix='pcteacher-tests-')
+os.environ.setdefault('EMAIL_QUEUE_PATH', os.path.join(_TMP, 'fila_emails.db'))
+os.environ.setdefault('BUSCA_INDEX_PATH', os.path.join(_TMP, 'busca_projetos.json'))
+os.environ.setdefault('ATIVIDADES_DIR', os.path.join(_TMP, 'atividades'))
+os.environ.pop('SMTP_HOST', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Substitui o cliente Firestore do app por um FakeFirestore em memória."""
+    import app as pcteacher
+    db = FakeFirestore()
+    monkeypatch.setattr(pcteacher, 'db', db, raising=False)
+    return db
@@ -0,0 +1,227 @@
+"""
+Substituto local do cliente Firestore para os testes.
+
+Implementa só o que o app usa (documentos, create/update/set, batch, get_all, consultas
+com where('==')/order_by('__name__')/start_after/limit) e
+transações otimistas: cada leitura na transação guarda a versão do documento e o
+commit aborta (google.api_core.exceptions.Aborted) se alguma versão mudou, de modo
+que o @firestore.transactional real repete a função como faria no servidor.
+"""
+import copy
+import itertools
+import threading
+
+from google.api_core.exceptions import Aborted, AlreadyExists, NotFound
+from google.cloud.firestore import DELETE_FIELD
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentRef:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self.path = (collection, doc_id)
+        self.id = doc_id
+
+    def get(self, field_paths=None, transaction=None):
+        with self._db.lock:
+            data, versao = self._db.docs.get(self.path, (None, 0))
+            self._db.leituras += 1
+        if transaction is not None:
+            transaction._registrar_leitura(self, versao)
+        if data is not None and field_paths is not None:
+            data = {k: v for k, v in data.items() if k in field_paths}
+        return FakeSnapshot(self, copy.deepcopy(data))
+
+    def create(self, data):
+        batch = self._db.batch()
+        batch.create(self, data)
+        batch.commit()
+
+    def update(self, data):
+        batch = self._db.batch()
+        batch.update(self, data)
+        batch.commit()
+
+    def set(self, data):
+        batch = self._db.batch()
+        batch.set(self, data)
+        batch.commit()
+
+
+class FakeQuery:
+    """Consulta sempre ordenada pelo ID do documento (o único order_by que o app usa)."""
+
+    def __init__(self, db, name, filtros=(), limite=None, depois_de=None):
+        self._db = db
+        self._name = name
+        self._filtros = filtros
+        self._limite = limite
+        self._depois_de = depois_de
+
+    def _copiar(self, **alteracoes):
+        atual = dict(filtros=self._filtros, limite=self._limite, depois_de=self._depois_de)
+        atual.update(alteracoes)
+        return FakeQuery(self._db, self._name, **atual)
+
+    def where(self, campo, operador, valor):
+        assert operador == '==', operador
+        return self._copiar(filtros=self._filtros + ((campo, valor),))
+
+    def order_by(self, campo):
+        assert campo == '__name__', campo
+        return self
+
+    def limit(self, limite):
+        return self._copiar(limite=limite)
+
+    def start_after(self, cursor):
+        # Aceita um snapshot ou {'__name__': referência}
+        ref = cursor['__name__'] if isinstance(cursor, dict) else cursor
+        return self._copiar(depois_de=ref.id)
+
+    def stream(self):
+        with self._db.lock:
+            ids = sorted(doc_id for col, doc_id in self._db.docs if col == self._name)
+            self._db.consultas += 1
+        resultado = []
+        for doc_id in ids:
+            if self._depois_de is not None and doc_id <= self._depois_de:
+                continue
+            snapshot = FakeDocumentRef(self._db, self._name, doc_id).get()
+            dados = snapshot.to_dict()
+            if all(dados.get(campo) == valor for campo, valor in self._filtros):
+                resultado.append(snapshot)
+            if self._limite is not None and len(resultado) == self._limite:
+                break
+        return iter(resultado)
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeDocumentRef(self._db, self._name, str(doc_id))
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._operacoes = []
+
+    def create(self, ref, data):
+        self._operacoes.append(('create', ref, data))
+
+    def update(self, ref, data):
+        self._operacoes.append(('update', ref, data))
+
+    def set(self, ref, data):
+        self._operacoes.append(('set', ref, data))
+
+    def _validar(self):
+        for tipo, ref, _ in self._operacoes:
+            existe = ref.path in self._db.docs
+            if tipo == 'create' and existe:
+                raise AlreadyExists(f'{ref.path} já existe')
+            if tipo == 'update' and not existe:
+                raise NotFound(f'{ref.path} não existe')
+
+    @staticmethod
+    def _atualizar(atual, alteracoes):
+        """update(): caminhos com hífen exigem crases e DELETE_FIELD remove a chave, como no Firestore."""
+        novo = dict(atual)
+        for caminho, valor in alteracoes.items():
+            if caminho.startswith('`') and caminho.endswith('`'):
+                chave = caminho[1:-1]
+            elif '-' in caminho:
+                raise ValueError(f'Caminho {caminho!r} inválido: use crases para nomes com hífen')
+            else:
+                chave = caminho
+            if valor is DELETE_FIELD:
+                novo.pop(chave, None)
+            else:
+                novo[chave] = valor
+        return novo
+
+    def _aplicar(self):
+        for tipo, ref, data in self._operacoes:
+            atual, versao = self._db.docs.get(ref.path, ({}, 0))
+            novo = self._atualizar(atual, data) if tipo == 'update' else dict(data)
+            self._db.docs[ref.path] = (novo, versao + 1)
+            self._db.escritas.append((ref.path, dict(data)))
+
+    def commit(self):
+        with self._db.lock:
+            self._validar()
+            self._aplicar()
+            self._db.commits.append(len(self._operacoes))
+
+
+class FakeTransaction(FakeBatch):
+    _ids = itertools.count(1)
+
+    def __init__(self, db, max_attempts=5):
+        super().__init__(db)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+        self._leituras = {}
+
+    def _registrar_leitura(self, ref, versao):
+        self._leituras.setdefault(ref.path, versao)
+
+    def _clean_up(self):
+        self._operacoes = []
+        self._leituras = {}
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = next(self._ids)
+        self._db.tentativas_transacao += 1
+
+    def _commit(self):
+        with self._db.lock:
+            for path, versao in self._leituras.items():
+                if self._db.docs.get(path, (None, 0))[1] != versao:
+                    raise Aborted('Documento alterado por outra transação')
+            self._validar()
+            self._aplicar()
+        self._clean_up()
+        return []
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}          # (coleção, id) -> (dados, versão)
+        self.escritas = []
+        self.leituras = 0
+        self.tentativas_transacao = 0
+        self.consultas = 0
+        self.commits = []       # nº de escritas de cada commit
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self, **kwargs)
+
+    def get_all(self, refs, field_paths=None):
+        for ref in refs:
+            yield ref.get(field_paths=field_paths)
+
+    def escritas_em(self, collection):
+        return [data for (col, _), data in self.escritas if col == collection]
@@ -0,0 +1,99 @@
+import pytest
+
+import app as pcteacher
+
+
+@pytest.fixture
+def registro(tmp_path, monkeypatch):
+    registro = pcteacher.RegistroAtividades('ndjson', str(tmp_path / 'atividades'))
+    monkeypatch.setattr(registro, '_iniciar_worker', lambda: None)
+    monkeypatch.setattr(pcteacher, 'registro_atividades', registro)
+    return registro
+
+
+@pytest.fixture
+def client():
+    client = pcteacher.app.test_client()
+    with client.session_transaction() as sessao:
+        sessao['usuario_id'] = 'u1'
+    return client
+
+
+def test_evento_do_cliente_validado_e_limitado(registro, client):
+    resposta = client.post('/atividade', json={'tipo': 'tempo_aula', 'modulo': 'abstracao', 'segundos': 10 ** 9})
+    assert resposta.status_code == 204
+    resposta = client.post('/atividade', json={
+        'tipo': 'quiz_tentativa', 'modulo': 'abstracao', 'questao': 'q' * 500, 'correta': True, 'extra': 'x',
+    })
+    assert resposta.status_code == 204
+
+    tempo, quiz = list(registro._buffer)
+    assert tempo['segundos'] == pcteacher.ATIVIDADE_SEGUNDOS_MAX
+    assert len(quiz['questao']) == pcteacher.ATIVIDADE_QUESTAO_MAX
+    assert 'extra' not in quiz
+
+
+def test_evento_invalido_rejeitado(registro, client):
+    assert client.post('/atividade', json={'tipo': 'tempo_aula', 'modulo': 'x' * 100000, 'segundos': 5}).status_code == 413
+    assert client.post('/atividade', json={'tipo': 'tempo_aula', 'modulo': 'x' * 1000, 'segundos': 5}).status_code == 400
+    assert client.post('/atividade', json={'tipo': 'quiz_tentativa', 'modulo': 'abstracao', 'questao': 'q1', 'correta': 'sim'}).status_code == 400
+    assert client.post('/atividade', json={'tipo': 'outro'}).status_code == 400
+    assert not registro._buffer
+
+
+def test_precache_nao_conta_como_aula_aberta(registro, client, fake_db):
+    curso = pcteacher.catalogo_cursos.curso()
+    fake_db.collection('usuarios').document('u1').set({'nome': 'Ana', 'email': 'ana@escola.br'})
+    fake_db.collection('progresso').document('u1').set(dict(curso.progresso_inicial))
+    url = f"/conteudo/{curso.modulos[0]['slug']}"
+
+    assert client.get(url, headers={'X-Precache': '1'}).status_code == 200
+    assert not registro._buffer
+
+    assert client.get(url).status_code == 200
+    assert [evento['tipo'] for evento in registro._buffer] == ['aula_aberta']
+
+
+def test_falha_na_gravacao_devolve_o_lote_ao_buffer(registro, monkeypatch):
+    for i in range(3):
+        registro.registrar('aula_aberta', f'u{i}', modulo='abstracao')
+
+    def falhar(eventos):
+        raise OSError('disco cheio')
+    monkeypatch.setattr(registro, '_gravar_ndjson', falhar)
+    with pytest.raises(OSError):
+        registro.descarregar()
+    assert [evento['user_id'] for evento in registro._buffer] == ['u0', 'u1', 'u2']
+
+    monkeypatch.undo()
+    registro.descarregar()
+    assert not registro._buffer
+    with open(registro._segmento, encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+
+
+def test_lote_devolvido_sem_espaco_conta_os_descartados(tmp_path, monkeypatch):
+    monkeypatch.setattr(pcteacher, 'ATIVIDADES_CAPACIDADE', 4)
+    registro = pcteacher.RegistroAtividades('ndjson', str(tmp_path / 'atividades'))
+    monkeypatch.setattr(registro, '_iniciar_worker', lambda: None)
+    for i in range(3):
+        registro.registrar('aula_aberta', f'antigo{i}', modulo='abstracao')
+
+    def falhar_apos_novos_eventos(eventos):
+        # Durante a gravação, chegam eventos novos e o buffer enche de novo
+        for i in range(3):
+            registro.registrar('aula_aberta', f'novo{i}', modulo='abstracao')
+        raise OSError('disco cheio')
+    monkeypatch.setattr(registro, '_gravar_ndjson', falhar_apos_novos_eventos)
+
+    with pytest.raises(OSError):
+        registro.descarregar()
+
+    # Cabe 1 dos 3 eventos devolvidos: os 2 mais antigos são descartados e contados
+    assert [evento['user_id'] for evento in registro._buffer] == ['antigo2', 'novo0', 'novo1', 'novo2']
+    assert registro.descartados == 2
+
+
+def test_destino_invalido_e_rejeitado(tmp_path):
+    with pytest.raises(ValueError):
+        pcteacher.RegistroAtividades('firebase', str(tmp_path))
@@ -0,0 +1,109 @@
+import json
+import time
+
+import pytest
+
+import app as pcteacher
+
+
+def novo_indice(tmp_path, nome='busca.json', **kwargs):
+    kwargs.setdefault('gravacao_automatica', False)
+    return pcteacher.IndiceProjetos(str(tmp_path / nome), **kwargs)
+
+
+def ids(resultado):
+    return [r['id'] for r in resultado[1]]
+
+
+def test_normalizacao_em_portugues():
+    assert pcteacher.normalizar_termos('Decomposições e padrões') == pcteacher.normalizar_termos('decomposição padrão')
+    assert pcteacher.normalizar_termos('Os algoritmos para a turma') == pcteacher.normalizar_termos('algoritmo turmas')
+    assert pcteacher.normalizar_termos('de para com') == []
+
+
+def test_nome_do_projeto_pesa_mais(tmp_path):
+    indice = novo_indice(tmp_path)
+    indice.atualizar('corpo', {'nome_projeto': 'Horta escolar', 'algoritmo': 'Robótica com sucata'})
+    indice.atualizar('nome', {'nome_projeto': 'Robótica na escola', 'algoritmo': 'Montagem de kits'})
+    indice.atualizar('outro', {'nome_projeto': 'Leitura', 'objetivo': 'Contar histórias'})
+
+    assert ids(indice.buscar('robotica')) == ['nome', 'corpo']
+    assert indice.buscar('inexistente') == (0, [])
+
+
+def test_filtro_por_publico_alvo(tmp_path):
+    indice = novo_indice(tmp_path)
+    indice.atualizar('p1', {'nome_projeto': 'Jogos de lógica', 'publico_alvo': '6º ano'})
+    indice.atualizar('p2', {'nome_projeto': 'Jogos matemáticos', 'publico_alvo': 'Ensino Médio'})
+    indice.atualizar('p3', {'nome_projeto': 'Frações', 'publico_alvo': 'ensino médio'})
+
+    assert ids(indice.buscar('jogos', publico_alvo='ensino medio')) == ['p2']
+    assert sorted(ids(indice.buscar('', publico_alvo='Ensino Médio'))) == ['p2', 'p3']
+
+    # O filtro acompanha a reindexação do projeto
+    indice.atualizar('p3', {'nome_projeto': 'Frações', 'publico_alvo': '7º ano'})
+    assert ids(indice.buscar('', publico_alvo='ensino médio')) == ['p2']
+
+
+def test_atualizar_nao_grava_no_disco(tmp_path):
+    indice = novo_indice(tmp_path)
+    indice.atualizar('p1', {'nome_projeto': 'Robótica'})
+    assert not (tmp_path / 'busca.json').exists()
+
+    indice.salvar()
+    recarregado = novo_indice(tmp_path)
+    assert ids(recarregado.buscar('robotica')) == ['p1']
+
+
+def test_gravacao_em_segundo_plano(tmp_path, monkeypatch):
+    monkeypatch.setattr(pcteacher, 'BUSCA_SAVE_INTERVAL', 0.05)
+    indice = novo_indice(tmp_path, gravacao_automatica=True)
+    indice.atualizar('p1', {'nome_projeto': 'Robótica'})
+
+    try:
+        limite = time.monotonic() + 5
+        while not (tmp_path / 'busca.json').exists() and time.monotonic() < limite:
+            time.sleep(0.02)
+        assert 'p1' in json.loads((tmp_path / 'busca.json').read_text(encoding='utf-8'))
+    finally:
+        indice.parar_worker()
+    assert indice._worker is None
+
+
+def test_recarrega_indice_reconstruido_e_reaplica_pendentes(tmp_path):
+    indice = novo_indice(tmp_path)
+    indice.atualizar('antigo', {'nome_projeto': 'Robótica antiga'})
+    indice.salvar()
+    indice.atualizar('local', {'nome_projeto': 'Robótica local'})
+
+    # Outro processo ('flask indexar-projetos') substitui o arquivo
+    reconstruido = novo_indice(tmp_path, 'novo.json')
+    reconstruido.atualizar('reconstruido', {'nome_projeto': 'Robótica reconstruída'})
+    reconstruido.salvar()
+    (tmp_path / 'novo.json').replace(tmp_path / 'busca.json')
+    indice._ultima_verificacao = 0
+
+    assert sorted(ids(indice.buscar('robotica'))) == ['local', 'reconstruido']
+
+
+def test_falha_na_gravacao_mantem_pendentes(tmp_path, monkeypatch):
+    indice = novo_indice(tmp_path)
+    indice.atualizar('p1', {'nome_projeto': 'Robótica'})
+
+    def falhar(origem, destino):
+        raise OSError('disco cheio')
+    monkeypatch.setattr(pcteacher.os, 'replace', falhar)
+    with pytest.raises(OSError):
+        indice.salvar()
+    monkeypatch.undo()
+
+    assert indice._sujo and 'p1' in indice._pendentes
+    indice.salvar()
+    assert ids(novo_indice(tmp_path).buscar('robotica')) == ['p1']
+
+
+def test_indice_gravado_sem_termos_do_publico(tmp_path):
+    documentos = {'p1': {'termos': {'robot': 3}, 'tamanho': 3, 'nome_projeto': 'Robótica', 'publico_alvo': '6º ano'}}
+    (tmp_path / 'busca.json').write_text(json.dumps(documentos), encoding='utf-8')
+
+    assert ids(novo_indice(tmp_path).buscar('', publico_alvo='6º ano')) == ['p1']
@@ -0,0 +1,48 @@
+import json
+import pathlib
+
+import pytest
+
+import app as pcteacher
+
+CURSOS_DIR = pathlib.Path(pcteacher.CATALOGO_DIR)
+
+
+def definicao(*ordens):
+    modulos = [
+        {
+            'title': f'Módulo {ordem}', 'field': f'm{ordem}', 'slug': f'modulo-{ordem}', 'template': 'x.html',
+            'order': ordem, 'description': '', 'lessons': 1, 'exercises': 1,
+        }
+        for ordem in ordens
+    ]
+    return {'slug': 'teste', 'versao': 1, 'titulo': 'Teste', 'modulos': modulos}
+
+
+def test_proximo_modulo_pela_posicao():
+    curso = pcteacher.compilar_curso(definicao(30, 10, 20))
+
+    assert [m['slug'] for m in curso.modulos] == ['modulo-10', 'modulo-20', 'modulo-30']
+    assert curso.proximo['modulo-10']['slug'] == 'modulo-20'
+    assert curso.proximo['modulo-20']['slug'] == 'modulo-30'
+    assert curso.proximo['modulo-30'] is None
+
+
+@pytest.mark.parametrize('ordem', ['2', 2.5, True])
+def test_ordem_deve_ser_inteira(ordem):
+    with pytest.raises(ValueError):
+        pcteacher.compilar_curso(definicao(1, ordem))
+
+
+def test_campos_de_progresso_unicos_entre_cursos(tmp_path):
+    padrao = json.loads((CURSOS_DIR / f'{pcteacher.CURSO_PADRAO}.json').read_text(encoding='utf-8'))
+    (tmp_path / 'padrao.json').write_text(json.dumps(padrao), encoding='utf-8')
+    outro = definicao(1, 2)
+    (tmp_path / 'outro.json').write_text(json.dumps(outro), encoding='utf-8')
+    assert len(pcteacher.CatalogoCursos(str(tmp_path)).cursos()) == 2
+
+    # Um campo repetido faria os dois cursos dividirem o mesmo progresso
+    outro['modulos'][1]['field'] = padrao['modulos'][0]['field']
+    (tmp_path / 'outro.json').write_text(json.dumps(outro), encoding='utf-8')
+    with pytest.raises(ValueError, match='campo de progresso'):
+        pcteacher.CatalogoCursos(str(tmp_path))
@@ -0,0 +1,107 @@
+import io
+import zipfile
+
+import app as pcteacher
+
+
+def test_registro_preserva_a_primeira_emissao(fake_db):
+    pcteacher.registrar_certificados([('u1', 'Ana')], '01/10/2026')
+    pcteacher.registrar_certificados([('u1', 'Ana Maria')], '19/10/2026')
+    pcteacher.registrar_certificados([('u1', 'Ana Maria'), ('u2', 'Bruno')], '20/10/2026')
+
+    certificado_id = pcteacher.codigo_certificado('u1').split('-')[0]
+    doc = fake_db.collection('certificados').document(certificado_id).get()
+    assert doc.to_dict()['data_emissao'] == '01/10/2026'
+    assert doc.to_dict()['nome'] == 'Ana'
+    assert doc.to_dict()['curso'] == pcteacher.catalogo_cursos.curso().titulo
+    assert len(fake_db.escritas_em('certificados')) == 2
+
+
+def test_verificacao_do_codigo_registrado(fake_db):
+    pcteacher.registrar_certificados([('u1', 'Ana')], '01/10/2026')
+    codigo = pcteacher.codigo_certificado('u1')
+    client = pcteacher.app.test_client()
+
+    resposta = client.get(f'/certificados/verificar/{codigo.lower()}')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['data_emissao'] == '01/10/2026'
+    assert 'max-age' in resposta.headers['Cache-Control']
+
+    leituras = fake_db.leituras
+    adulterado = codigo[:-1] + ('A' if codigo[-1] != 'A' else 'B')
+    assert client.get(f'/certificados/verificar/{adulterado}').status_code == 404
+    assert fake_db.leituras == leituras  # assinatura inválida não consulta o banco
+
+
+def test_codigo_malformado_e_rejeitado_sem_erro(fake_db):
+    client = pcteacher.app.test_client()
+    codigo = pcteacher.codigo_certificado('u1')
+
+    for invalido in ('é-x', 'ABC-É', codigo + 'A', codigo.replace('-', ''), f'{codigo[:-1]}1', ''):
+        assert pcteacher.validar_codigo_certificado(invalido) is None
+    for invalido in ('é-x', 'ABC-É', f'{codigo}-{codigo}'):
+        assert client.get(f'/certificados/verificar/{invalido}').status_code == 404
+    assert fake_db.leituras == 0
+
+
+def test_pagina_do_certificado_registra_o_codigo(fake_db):
+    curso = pcteacher.catalogo_cursos.curso()
+    fake_db.collection('usuarios').document('u1').set({'nome': 'Ana', 'email': 'ana@escola.br'})
+    fake_db.collection('progresso').document('u1').set({m['field']: True for m in curso.modulos})
+    client = pcteacher.app.test_client()
+    with client.session_transaction() as sessao:
+        sessao['usuario_id'] = 'u1'
+
+    assert client.get('/certificado').status_code == 200
+
+    codigo = pcteacher.codigo_certificado('u1')
+    assert client.get(f'/certificados/verificar/{codigo}').get_json()['valido'] is True
+
+
+def concluintes_na_turma(fake_db, total):
+    curso = pcteacher.catalogo_cursos.curso()
+    for i in range(total):
+        fake_db.collection('usuarios').document(f'u{i}').set({'nome': f'Prof {i} & Cia_{i}'})
+        fake_db.collection('progresso').document(f'u{i}').set({m['field']: True for m in curso.modulos})
+    # Concluiu só o último módulo (dados inconsistentes): não recebe certificado
+    fake_db.collection('progresso').document('incompleto').set(dict(curso.progresso_inicial, **{curso.modulos[-1]['field']: True}))
+
+
+def test_zip_da_turma_em_paginas(fake_db):
+    concluintes_na_turma(fake_db, 5)
+
+    paginas = list(pcteacher.listar_concluintes(page_size=2))
+    # 6 documentos com o último módulo concluído, 2 por página; 'incompleto' fica de fora
+    assert [len(p) for p in paginas] == [1, 2, 2]
+
+    conteudo = b''.join(pcteacher.gerar_zip_certificados(iter(paginas), workers=2, url_base='https://pcteacher.test'))
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+        nomes = zf.namelist()
+        tex = zf.read(next(n for n in nomes if n.endswith('_u0.tex'))).decode('utf-8')
+
+    assert len(nomes) == 5
+    assert r'PROF 0 \& CIA\_0' in tex
+    assert pcteacher.catalogo_cursos.curso().titulo in tex
+    assert f"https://pcteacher.test/certificados/verificar/{pcteacher.codigo_certificado('u0')}" in tex.replace(r'\_', '_')
+    assert len(fake_db.escritas_em('certificados')) == 5
+
+
+def test_nome_com_comandos_latex_e_escapado():
+    tex = pcteacher.generate_latex_certificate(r'ANA \input{/etc/passwd} 100% #1', '1 de maio de 2026', 24)
+    assert r'\input{' not in tex
+    assert r'ANA \textbackslash{}input\{/etc/passwd\} 100\% \#1' in tex
+
+
+def test_cli_exige_site_url(fake_db, tmp_path):
+    concluintes_na_turma(fake_db, 1)
+    destino = tmp_path / 'turma.zip'
+    runner = pcteacher.app.test_cli_runner()
+
+    resultado = runner.invoke(args=['gerar-certificados', str(destino), '--site-url', ''])
+    assert resultado.exit_code != 0 and 'SITE_URL' in resultado.output
+    assert not destino.exists()
+
+    resultado = runner.invoke(args=['gerar-certificados', str(destino), '--site-url', 'https://pcteacher.test/'])
+    assert resultado.exit_code == 0, resultado.output
+    with zipfile.ZipFile(destino) as zf:
+        assert len(zf.namelist()) == 1
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+import app as pcteacher
+from fake_firestore import FakeTransaction
+
+
+class FilaFake:
+    def __init__(self):
+        self.enviados = []
+
+    def enfileirar(self, tipo, destinatario, janela_unica=None, **dados):
+        self.enviados.append((tipo, destinatario, dados))
+        return True
+
+
+@pytest.fixture
+def ambiente(fake_db, monkeypatch):
+    fila = FilaFake()
+    monkeypatch.setattr(pcteacher, 'fila_emails', fila)
+    monkeypatch.setattr(pcteacher.registro_atividades, 'registrar', lambda *args, **kwargs: None)
+    fake_db.collection('usuarios').document('u1').set({'nome': 'Ana', 'email': 'ana@escola.br'})
+
+    # Registra o resultado de cada chamada da rota
+    resultados = []
+    transacao_original = pcteacher._concluir_modulo_transacao
+
+    def registrar_resultado(*args, **kwargs):
+        resultado = transacao_original(*args, **kwargs)
+        resultados.append(resultado)
+        return resultado
+    monkeypatch.setattr(pcteacher, '_concluir_modulo_transacao', registrar_resultado)
+
+    fake_db.escritas.clear()
+    return fake_db, fila, resultados
+
+
+def cliente():
+    client = pcteacher.app.test_client()
+    with client.session_transaction() as sessao:
+        sessao['usuario_id'] = 'u1'
+    return client
+
+
+def modulos():
+    curso = pcteacher.catalogo_cursos.curso()
+    primeiro = next(m for m in curso.modulos if not m['dependency_field'])
+    dependente = next(m for m in curso.modulos if m['dependency_field'])
+    return curso, primeiro, dependente
+
+
+def test_conclusoes_simultaneas_gravam_uma_vez(ambiente, monkeypatch):
+    db, fila, resultados = ambiente
+    curso, primeiro, _ = modulos()
+    db.collection('progresso').document('u1').set(dict(curso.progresso_inicial))
+    db.escritas.clear()
+
+    # Todas as transações leem o progresso antes de qualquer commit, forçando o conflito
+    paralelas = 4
+    barreira = threading.Barrier(paralelas, timeout=5)
+    commit_original = FakeTransaction._commit
+
+    def commit_apos_todas_lerem(self):
+        if not getattr(self, '_esperou', False):
+            self._esperou = True
+            barreira.wait()
+        return commit_original(self)
+    monkeypatch.setattr(FakeTransaction, '_commit', commit_apos_todas_lerem)
+
+    respostas = []
+    def concluir():
+        respostas.append(cliente().post(f"/concluir-modulo/{primeiro['slug']}"))
+    threads = [threading.Thread(target=concluir) for _ in range(paralelas)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in respostas] == [302] * paralelas
+    assert sorted(resultados) == ['concluido'] + ['ja_concluido'] * (paralelas - 1)
+    assert db.escritas_em('progresso') == [{primeiro['field']: True}]
+    assert db.tentativas_transacao > paralelas  # as perdedoras foram repetidas
+    assert len(fila.enviados) == 1
+
+
+def test_dependencia_pendente_nao_grava(ambiente):
+    db, fila, resultados = ambiente
+    curso, _, dependente = modulos()
+    db.collection('progresso').document('u1').set(dict(curso.progresso_inicial))
+    db.escritas.clear()
+
+    resposta = cliente().post(f"/concluir-modulo/{dependente['slug']}")
+
+    assert resposta.headers['Location'].endswith('/modulos')
+    assert resultados == ['dependencia_pendente']
+    assert db.escritas_em('progresso') == []
+    assert fila.enviados == []
+
+
+def test_progresso_ausente_e_criado(ambiente):
+    db, _, resultados = ambiente
+    curso, primeiro, dependente = modulos()
+    client = cliente()
+
+    assert client.post(f"/concluir-modulo/{dependente['slug']}").headers['Location'].endswith('/modulos')
+    assert client.post(f"/concluir-modulo/{primeiro['slug']}").headers['Location'].endswith('/modulos')
+
+    assert resultados == ['dependencia_pendente', 'concluido']
+    progresso = db.collection('progresso').document('u1').get().to_dict()
+    assert progresso == dict(curso.progresso_inicial, **{primeiro['field']: True})
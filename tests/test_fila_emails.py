@@ -0,0 +1,133 @@
+import smtplib
+import sqlite3
+import time
+
+import pytest
+
+import app as pcteacher
+
+
+class FakeSMTP:
+    """Substituto local do smtplib.SMTP: registra as mensagens e pode falhar sob demanda."""
+
+    conexoes = 0
+
+    def __init__(self, falhar=None):
+        self.falhar = falhar
+        self.enviadas = []
+        FakeSMTP.conexoes += 1
+
+    def send_message(self, mensagem):
+        if self.falhar:
+            raise self.falhar
+        self.enviadas.append(mensagem)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fila(tmp_path):
+    return pcteacher.FilaEmails(str(tmp_path / 'fila.db'))
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    FakeSMTP.conexoes = 0
+    servidor = FakeSMTP()
+    monkeypatch.setattr(pcteacher, '_abrir_smtp', lambda: servidor)
+    monkeypatch.setattr(pcteacher.auth, 'generate_password_reset_link', lambda email: f'https://reset/{email}')
+    return servidor
+
+
+def linhas(fila):
+    with sqlite3.connect(fila.path) as conn:
+        return conn.execute('SELECT destinatario, status, tentativas, proxima_tentativa FROM emails ORDER BY id').fetchall()
+
+
+def notificar(fila, destinatario):
+    fila.enfileirar('modulo_concluido', destinatario, nome='Ana', modulo='Abstração', proximo='Algoritmos')
+
+
+def test_lote_enviado_por_uma_unica_conexao(fila, smtp, monkeypatch):
+    monkeypatch.setattr(pcteacher, 'EMAIL_LOTE', 2)
+    for i in range(3):
+        notificar(fila, f'prof{i}@escola.br')
+
+    assert fila.processar_lote() == 2
+    assert FakeSMTP.conexoes == 1
+    assert [m['To'] for m in smtp.enviadas] == ['prof0@escola.br', 'prof1@escola.br']
+
+    assert fila.processar_lote() == 1
+    assert [status for _, status, _, _ in linhas(fila)] == ['enviado', 'enviado', 'enviado']
+    assert fila.processar_lote() == 0
+
+
+def test_falha_reagenda_com_backoff(fila, smtp):
+    smtp.falhar = smtplib.SMTPServerDisconnected('caiu')
+    notificar(fila, 'prof@escola.br')
+
+    antes = time.time()
+    fila.processar_lote()
+
+    _, status, tentativas, proxima = linhas(fila)[0]
+    assert (status, tentativas) == ('pendente', 1)
+    assert proxima >= antes + pcteacher.EMAIL_BACKOFF_BASE * 0.8
+    # Ainda não venceu: não é reservado de novo
+    assert fila.processar_lote() == 0
+
+
+def test_falha_apos_max_tentativas(fila, smtp):
+    smtp.falhar = smtplib.SMTPServerDisconnected('caiu')
+    notificar(fila, 'prof@escola.br')
+    with sqlite3.connect(fila.path) as conn:
+        conn.execute('UPDATE emails SET tentativas = ?', (pcteacher.EMAIL_MAX_TENTATIVAS - 1,))
+
+    fila.processar_lote()
+
+    _, status, tentativas, _ = linhas(fila)[0]
+    assert (status, tentativas) == ('falhou', pcteacher.EMAIL_MAX_TENTATIVAS)
+
+
+def test_usuario_inexistente_e_descartado(fila, smtp, monkeypatch):
+    def sem_usuario(email):
+        raise pcteacher.auth.UserNotFoundError('não existe')
+    monkeypatch.setattr(pcteacher.auth, 'generate_password_reset_link', sem_usuario)
+    fila.enfileirar('redefinir_senha', 'ninguem@escola.br')
+    notificar(fila, 'prof@escola.br')
+
+    fila.processar_lote()
+
+    assert [(d, s) for d, s, _, _ in linhas(fila)] == [('ninguem@escola.br', 'descartado'), ('prof@escola.br', 'enviado')]
+    assert len(smtp.enviadas) == 1
+
+
+def test_recuperacao_deduplicada_e_limitada_por_ip(fila, monkeypatch):
+    monkeypatch.setattr(pcteacher, 'fila_emails', fila)
+    monkeypatch.setattr(pcteacher, 'RECUPERACAO_LIMITE_IP', 4)
+    client = pcteacher.app.test_client()
+
+    respostas = [client.post('/recuperar_senha', json={'email': 'prof@escola.br'}) for _ in range(3)]
+    assert [r.status_code for r in respostas] == [202, 202, 202]
+    assert len(linhas(fila)) == 1
+
+    assert client.post('/recuperar_senha', json={'email': 'outro@escola.br'}).status_code == 202
+    assert client.post('/recuperar_senha', json={'email': 'mais@escola.br'}).status_code == 429
+    assert len(linhas(fila)) == 2
+
+
+def test_worker_iniciado_ao_criar_a_fila(tmp_path, smtp, monkeypatch):
+    monkeypatch.setattr(pcteacher, 'SMTP_HOST', 'localhost')
+    fila = pcteacher.FilaEmails(str(tmp_path / 'fila.db'))
+    try:
+        assert fila._worker is not None and fila._worker.is_alive()
+        notificar(fila, 'prof@escola.br')
+
+        limite = time.monotonic() + 5
+        while not smtp.enviadas and time.monotonic() < limite:
+            time.sleep(0.02)
+        assert [m['To'] for m in smtp.enviadas] == ['prof@escola.br']
+    finally:
+        worker = fila._worker
+        fila.parar_worker()
+    assert not worker.is_alive()
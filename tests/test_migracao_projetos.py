@@ -0,0 +1,82 @@
+import app as pcteacher
+
+
+def projeto_antigo(fake_db, doc_id, **dados):
+    fake_db.collection('projetos').document(doc_id).set(dict({
+        'nome_projeto': f'Projeto {doc_id}',
+        'otimizacao_padrao': 'padrões antigos',
+        'publico-alvo': '6º ano',
+    }, **dados))
+
+
+def projeto(fake_db, doc_id):
+    return fake_db.collection('projetos').document(doc_id).get().to_dict()
+
+
+def test_migracao_renomeia_as_chaves_antigas(fake_db):
+    projeto_antigo(fake_db, 'p1')
+
+    assert pcteacher.migrar_projetos() == (1, 1, 'p1')
+
+    assert projeto(fake_db, 'p1') == {
+        'nome_projeto': 'Projeto p1',
+        'rec_padrao': 'padrões antigos',
+        'publico_alvo': '6º ano',
+        'schema_version': pcteacher.PROJETOS_SCHEMA_VERSION,
+    }
+
+
+def test_migracao_preserva_valores_novos(fake_db):
+    # Professor editou depois do deploy (chaves novas) e antes da migração rodar
+    projeto_antigo(fake_db, 'p1', rec_padrao='padrões revisados', publico_alvo='')
+
+    pcteacher.migrar_projetos()
+
+    dados = projeto(fake_db, 'p1')
+    assert dados['rec_padrao'] == 'padrões revisados'
+    assert dados['publico_alvo'] == '6º ano'
+    assert 'otimizacao_padrao' not in dados and 'publico-alvo' not in dados
+
+
+def test_leitura_usa_chaves_antigas_ate_a_migracao(fake_db):
+    projeto_antigo(fake_db, 'u1', rec_padrao='')
+
+    dados = pcteacher.get_projeto_usuario('u1')
+
+    assert dados['rec_padrao'] == 'padrões antigos'
+    assert dados['publico_alvo'] == '6º ano'
+
+
+def test_lotes_de_no_maximo_500_escritas(fake_db):
+    for i in range(1100):
+        projeto_antigo(fake_db, f'p{i:04d}')
+    fake_db.commits.clear()
+
+    examinados, migrados, ultimo_id = pcteacher.migrar_projetos(page_size=1000)
+
+    assert (examinados, migrados, ultimo_id) == (1100, 1100, 'p1099')
+    assert fake_db.commits == [500, 500, 100]
+
+
+def test_dry_run_nao_grava(fake_db):
+    for i in range(3):
+        projeto_antigo(fake_db, f'p{i}')
+    fake_db.escritas.clear()
+
+    assert pcteacher.migrar_projetos(dry_run=True, page_size=2) == (3, 3, 'p2')
+    assert fake_db.escritas == []
+
+
+def test_retoma_pelo_id(fake_db):
+    for i in range(5):
+        projeto_antigo(fake_db, f'p{i}')
+    # Documentos já migrados são apenas examinados
+    pcteacher.migrar_projetos(page_size=2)
+    projeto_antigo(fake_db, 'p5')
+    fake_db.escritas.clear()
+
+    resultado = pcteacher.app.test_cli_runner().invoke(args=['migrar-projetos', '--desde', 'p3'])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert '2 projetos examinados, 1 migrados' in resultado.output
+    assert [caminho for caminho, _ in fake_db.escritas] == [('projetos', 'p5')]
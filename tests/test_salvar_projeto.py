@@ -0,0 +1,50 @@
+import pytest
+
+import app as pcteacher
+
+
+@pytest.fixture
+def client(fake_db, monkeypatch):
+    monkeypatch.setattr(pcteacher.indice_projetos, 'atualizar', lambda *args: None)
+    for uid, nome in (('u1', 'Ana'), ('u2', 'Bruno')):
+        fake_db.collection('usuarios').document(uid).set({'nome': nome, 'email': f'{uid}@escola.br'})
+        fake_db.collection('projetos').document(uid).set({'nome_projeto': ''})
+    fake_db.escritas.clear()
+
+    client = pcteacher.app.test_client()
+    with client.session_transaction() as sessao:
+        sessao['usuario_id'] = 'u2'
+    return client
+
+
+def salvar(client, dono, chave='chave-0001'):
+    return client.post('/projeto/salvar', data={'nome_projeto': 'Robótica'}, headers={
+        'Accept': 'application/json', 'Idempotency-Key': chave, 'X-Usuario-Id': dono,
+    })
+
+
+def test_salvamento_de_outro_usuario_e_retido(client, fake_db):
+    # Fila offline da professora u1 reenviada depois que u2 entrou no mesmo navegador
+    resposta = salvar(client, 'u1')
+
+    assert resposta.status_code == 409
+    assert resposta.get_json()['outro_usuario'] is True
+    assert fake_db.escritas == []
+
+
+def test_salvamento_do_dono_aplicado_uma_vez(client, fake_db):
+    assert salvar(client, 'u2').get_json()['success'] is True
+    assert salvar(client, 'u2').get_json()['duplicado'] is True
+
+    assert fake_db.escritas_em('projetos') == [{'nome_projeto': 'Robótica'}]
+    assert fake_db.collection('projetos').document('u1').get().to_dict() == {'nome_projeto': ''}
+
+
+def test_pagina_informa_o_usuario_ao_service_worker(client, fake_db):
+    curso = pcteacher.catalogo_cursos.curso()
+    fake_db.collection('progresso').document('u2').set(dict(curso.progresso_inicial))
+
+    html = client.get(f"/conteudo/{curso.modulos[0]['slug']}").get_data(as_text=True)
+
+    assert 'data-usuario="u2"' in html
+    assert 'const usuarioAtualId = "u2";' in html